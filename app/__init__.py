@@ -1,10 +1,49 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
+# 数据库初始化失败后的重试间隔（秒）
+DB_RETRY_INTERVAL = float(os.environ.get("IMG_JX_DB_RETRY_INTERVAL", 5))
+
+
+async def initialize_db():
+    """
+    后台初始化数据库：创建索引、恢复未完成的任务，失败时按间隔重试。
+
+    数据库不可用时服务照常启动，不依赖数据库的接口（如 /api/img_jx）可以正常使用。
+    """
+    from app.db.db import init_db
+    from app.api_server.jobs import job_manager
+    while True:
+        try:
+            await init_db()
+            await job_manager.recover()
+            print("数据库初始化完成")
+            return
+        except Exception as e:
+            print(f"数据库初始化失败，{DB_RETRY_INTERVAL} 秒后重试: {e}")
+            await asyncio.sleep(DB_RETRY_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动/停止后台任务 worker，数据库初始化在后台进行，不阻塞启动
+    from app.api_server.jobs import job_manager
+    job_manager.start()
+    init_task = asyncio.create_task(initialize_db())
+    yield
+    init_task.cancel()
+    await asyncio.gather(init_task, return_exceptions=True)
+    await job_manager.stop()
+
+
 def create_app():
-    app = FastAPI()
+    app = FastAPI(lifespan=lifespan)
 
     # 导入并注册路由
     from app.api_router.router import router
     app.include_router(router)
 
-    return app
\ No newline at end of file
+    return app
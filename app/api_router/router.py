@@ -1,33 +1,119 @@
 from typing import Optional
 from xml.sax.handler import property_interning_dict
 
-from fastapi import APIRouter, UploadFile
+from fastapi import APIRouter, Form, HTTPException, Query, Request, UploadFile
+from fastapi.responses import StreamingResponse
 
 
-from app.api_server.route_img_jx import image_jx,img_jx_and_db
+from app.api_server.export import MEDIA_TYPES, build_query, export_stream, parse_export_fields
+from app.api_server.images import serve_image, serve_thumbnail
+from app.api_server.jobs import job_manager
+from app.api_server.response import ImageJxResponse, success_response
+from app.api_server.route_img_jx import image_jx,img_jx_and_db,img_jx_flight,img_rjx
+from app.db.stats import DIMENSIONS, MAX_STATS_LIMIT, get_stats
+from app.utils.admission import AdmissionController
 
 router = APIRouter()
 
 # GET 请求：可以接收 URL 或文件上传的图片进行处理
-@router.get("/api/img_jx")
+@router.get("/api/img_jx", response_model=ImageJxResponse)
 async def process_image_request(
         url: Optional[str] = None,  # 可选的 URL 查询参数
-        file: Optional[UploadFile] = None  # 可选的上传文件
+        file: Optional[UploadFile] = None,  # 可选的上传文件
+        fields: Optional[str] = None  # 可选的字段投影，逗号分隔的点路径
 ):
-    return await image_jx(url, file)
-@router.post("/api/img_jx_and_db")
+    return await image_jx(url, file, fields)
+@router.post("/api/img_jx_and_db", response_model=ImageJxResponse)
 async def api_img_jx_and_db(
         url: Optional[str] = None,  # 可选的 URL 查询参数
-        file: Optional[UploadFile] = None  # 可选的上传文件
+        file: Optional[UploadFile] = None,  # 可选的上传文件
+        fields: Optional[str] = None  # 可选的字段投影，逗号分隔的点路径
 ):
-    return await img_jx_and_db(url, file)
+    return await img_jx_and_db(url, file, fields)
 
 
-# POST 请求：接收数据（在这里我们只是作为占位符，未实现）
+# 异步任务：提交后立即返回任务 ID，由后台 worker 处理
+@router.post("/api/jobs", response_model=ImageJxResponse)
+async def submit_job(
+        url: Optional[str] = None,  # 可选的 URL 查询参数
+        file: Optional[UploadFile] = None,  # 可选的上传文件
+        operation: str = "img_jx_and_db",  # 任务操作：img_jx 或 img_jx_and_db
+        callback_url: Optional[str] = None  # 可选的回调地址，任务结束后 POST 结果
+):
+    return success_response(await job_manager.submit(operation, url, file, callback_url))
+@router.get("/api/jobs/{job_id}", response_model=ImageJxResponse)
+async def get_job(job_id: str):
+    return success_response(await job_manager.get(job_id))
+
+
+# 流式导出 images 集合（NDJSON 或 CSV），after 为上次导出的最后一个序号
+@router.get("/api/export")
+async def export_images(
+        format: str = "ndjson",  # 导出格式：ndjson 或 csv
+        after: Optional[int] = None,  # 从该序号之后开始导出（断点续传）
+        fields: Optional[str] = None,  # 逗号分隔的导出字段
+        sampler: Optional[str] = None,  # 按采样器过滤
+        width: Optional[int] = None,  # 按宽度过滤
+        height: Optional[int] = None  # 按高度过滤
+):
+    if format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"不支持的导出格式: {format}")
+    try:
+        export_fields = parse_export_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    query = build_query(after, sampler, width, height)
+    return StreamingResponse(
+        export_stream(format, query, export_fields),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=images.{format}"},
+    )
+
+
+# 统计信息：直接读取增量维护的计数，不扫描 images 集合
+@router.get("/api/stats", response_model=ImageJxResponse)
+async def stats(
+        dimension: Optional[str] = None,  # 统计维度：采样器、步数、缩放、尺寸，默认全部
+        limit: int = Query(50, ge=1, le=MAX_STATS_LIMIT)  # 每个维度返回的数量最多的前 N 项
+):
+    if dimension is not None and dimension not in DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"不支持的统计维度: {dimension}")
+    return success_response(await get_stats(dimension, limit))
+
+
+# 已入库的原图（支持 ETag / Range）
+@router.get("/api/images/{index}")
+async def get_image(request: Request, index: int):
+    return await serve_image(request, index)
+# 缩略图：首次请求时生成并缓存到磁盘
+@router.get("/api/images/{index}/thumbnail")
+async def get_thumbnail(
+        request: Request,
+        index: int,
+        size: int = 256,  # 缩略图边长：128、256、512
+        format: str = "webp"  # 缩略图格式：webp 或 jpeg
+):
+    return await serve_thumbnail(request, index, size, format)
+
+
+# POST 请求：将元数据嵌入图片（LSB 隐写），以 PNG 流返回
 @router.post("/api/img_rjx")
-async def receive_data():
-    return {"message": "未实现"}
+async def receive_data(
+        file: UploadFile,  # 需要嵌入数据的图片
+        metadata: str = Form(...),  # JSON 格式的元数据字典
+        compress_level: int = 6,  # PNG 压缩级别 0~9，越小越快、文件越大
+        text_chunk: bool = False  # 是否同时把元数据写入 tEXt 块
+):
+    return await img_rjx(file, metadata, compress_level, text_chunk)
 # 添加心跳请求
 @router.get("/api/health")
 async def health_check():
-    return {"status": "OK", "message": "服务正常运行"}
\ No newline at end of file
+    return {"status": "OK", "message": "服务正常运行"}
+# 运行指标：并发请求合并、准入控制情况
+@router.get("/api/metrics")
+async def metrics():
+    return {
+        "请求合并": img_jx_flight.stats(),
+        "准入控制": AdmissionController.stats(),
+        "异步任务": job_manager.stats(),
+    }
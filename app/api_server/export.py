@@ -0,0 +1,101 @@
+import asyncio
+import csv
+import io
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import orjson
+from fastapi import HTTPException
+
+from app.api_server.img_jx import REQUIRED_FIELDS
+from app.db.db import collection
+
+# 导出的字段（默认全部）
+EXPORT_FIELDS = ["序号", "文件名"] + REQUIRED_FIELDS
+EXPORT_BATCH_SIZE = 1000  # 每批从 MongoDB 读取的文档数
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def build_query(
+        after: Optional[int] = None,
+        sampler: Optional[str] = None,
+        width: Optional[int] = None,
+        height: Optional[int] = None
+) -> Dict[str, Any]:
+    """构造导出查询条件；after 为上次导出的最后一个序号，用于断点续传"""
+    query: Dict[str, Any] = {}
+    if after is not None:
+        query["序号"] = {"$gt": after}
+    if sampler is not None:
+        query["采样器"] = sampler
+    if width is not None:
+        query["宽度"] = width
+    if height is not None:
+        query["高度"] = height
+    return query
+
+
+def parse_export_fields(fields: Optional[str]) -> List[str]:
+    """解析逗号分隔的导出字段，序号始终作为第一个字段以便续传；包含不支持的字段时抛出 ValueError"""
+    if not fields:
+        return list(EXPORT_FIELDS)
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in EXPORT_FIELDS]
+    if unknown:
+        raise ValueError(f"不支持的导出字段: {','.join(unknown)}")
+    return ["序号"] + [field for field in selected if field != "序号"]
+
+
+async def iter_documents(
+        query: Dict[str, Any],
+        fields: List[str],
+        batch_size: int = EXPORT_BATCH_SIZE
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """按序号升序分批读取文档，每次只在内存中保留一批"""
+    projection = {field: 1 for field in fields}
+    projection["_id"] = 0
+    cursor = collection.find(query, projection).sort("序号", 1).batch_size(batch_size)
+
+    batch = []
+    async for document in cursor:
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+            # 每批之间让出事件循环，避免长时间导出影响在线请求
+            await asyncio.sleep(0)
+    if batch:
+        yield batch
+
+
+async def stream_ndjson(batches: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """每行一个 JSON 文档"""
+    async for batch in batches:
+        yield b"".join(orjson.dumps(document) + b"\n" for document in batch)
+
+
+async def stream_csv(batches: AsyncIterator[List[Dict[str, Any]]], fields: List[str]) -> AsyncIterator[bytes]:
+    """第一行为表头，之后每行一个文档"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    yield buffer.getvalue().encode("utf-8")
+
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def export_stream(export_format: str, query: Dict[str, Any], fields: List[str]) -> AsyncIterator[bytes]:
+    """根据导出格式返回字节流生成器"""
+    batches = iter_documents(query, fields)
+    if export_format == "ndjson":
+        return stream_ndjson(batches)
+    if export_format == "csv":
+        return stream_csv(batches, fields)
+    raise HTTPException(status_code=400, detail=f"不支持的导出格式: {export_format}")
@@ -0,0 +1,112 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+from PIL import Image
+from starlette.staticfiles import NotModifiedResponse
+
+from app.api_server.img_jx import UPLOAD_FOLDER, stored_file_name
+from app.api_server.response import ZeroCopyFileResponse
+from app.core.container_scan import ContainerMetadataScanner
+from app.utils.single_flight import SingleFlight
+
+# 缩略图配置（可通过环境变量覆盖）
+THUMBNAIL_FOLDER = os.environ.get("IMG_JX_THUMBNAIL_FOLDER", os.path.join(UPLOAD_FOLDER, "thumbnails"))
+THUMBNAIL_WORKERS = int(os.environ.get("IMG_JX_THUMBNAIL_WORKERS", 4))  # 生成缩略图的线程数
+THUMBNAIL_SIZES = (128, 256, 512)  # 允许的缩略图边长，限制磁盘缓存的组合数
+THUMBNAIL_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+CACHE_CONTROL = "public, max-age=86400"
+
+# Pillow 的缩放和编码会释放 GIL，用线程池即可并行生成
+thumbnail_executor = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumbnail")
+# 同一张缩略图的并发请求只生成一次
+thumbnail_flight = SingleFlight()
+
+
+def stored_image_path(index: int) -> str:
+    path = os.path.join(UPLOAD_FOLDER, stored_file_name(index))
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail=f"图片不存在: {index}")
+    return path
+
+
+def sniff_media_type(path: str) -> str:
+    """根据文件头判断实际格式（入库文件统一以 .png 命名，内容可能是 JPEG/WebP）"""
+    with open(path, "rb") as f:
+        header = f.read(12)
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    image_format = ContainerMetadataScanner.detect_format(header)
+    if image_format == "JPEG":
+        return "image/jpeg"
+    if image_format == "WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def render_thumbnail(source: str, target: str, size: int, image_format: str):
+    """生成缩略图：先写临时文件再原子替换，避免并发读到不完整的文件"""
+    with Image.open(source) as image:
+        # JPEG 可以在解码时直接按比例缩小，减少解码开销
+        image.draft("RGB", (size, size))
+        image.thumbnail((size, size))
+        if image_format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+
+        if not os.path.exists(THUMBNAIL_FOLDER):
+            os.makedirs(THUMBNAIL_FOLDER, exist_ok=True)
+        temp_path = f"{target}.{os.getpid()}.tmp"
+        image.save(temp_path, format=image_format, quality=80)
+    os.replace(temp_path, target)
+
+
+async def ensure_thumbnail(index: int, size: int, thumbnail_format: str) -> str:
+    """返回缩略图路径，首次请求时在线程池中生成并缓存到磁盘"""
+    image_format = THUMBNAIL_FORMATS[thumbnail_format][0]
+    target = os.path.join(THUMBNAIL_FOLDER, f"{index}_{size}.{thumbnail_format}")
+    if os.path.isfile(target):
+        return target
+
+    source = stored_image_path(index)
+    loop = asyncio.get_running_loop()
+    await thumbnail_flight.do(
+        target,
+        lambda: loop.run_in_executor(thumbnail_executor, render_thumbnail, source, target, size, image_format),
+    )
+    return target
+
+
+def file_response(request: Request, path: str, media_type: str) -> Response:
+    """返回带 ETag / Last-Modified 的文件响应，支持 Range；ETag 匹配时返回 304"""
+    response = ZeroCopyFileResponse(
+        path,
+        media_type=media_type,
+        stat_result=os.stat(path),
+        headers={"Cache-Control": CACHE_CONTROL},
+    )
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and response.headers["etag"] in [tag.strip() for tag in if_none_match.split(",")]:
+        return NotModifiedResponse(response.headers)
+    return response
+
+
+async def serve_image(request: Request, index: int) -> Response:
+    path = stored_image_path(index)
+    return file_response(request, path, sniff_media_type(path))
+
+
+async def serve_thumbnail(request: Request, index: int, size: int, thumbnail_format: str) -> Response:
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=400, detail=f"缩略图尺寸必须是 {THUMBNAIL_SIZES} 之一")
+    if thumbnail_format not in THUMBNAIL_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的缩略图格式: {thumbnail_format}")
+
+    path = await ensure_thumbnail(index, size, thumbnail_format)
+    return file_response(request, path, THUMBNAIL_FORMATS[thumbnail_format][1])
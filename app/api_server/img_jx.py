@@ -1,3 +1,5 @@
+import asyncio
+import hashlib
 import os
 from io import BytesIO
 from typing import Optional
@@ -5,27 +7,48 @@ import json
 
 from app.utils.en_cn import MetadataTranslator
 from app.core.rs import Reading_Steganography
+from app.core.container_scan import ContainerMetadataScanner
 from app.core.ripd import ImageMetadataExtractor
 from app.db.db import collection
+from app.db.stats import increment_stats
 # 图片元数据处理逻辑
-UPLOAD_FOLDER = "E:\\ai\\jx"
+UPLOAD_FOLDER = os.environ.get("IMG_JX_UPLOAD_FOLDER", "E:\\ai\\jx")
 async def img_metadata(img_data: BytesIO):
-    # 获取所有元数据
-    exif = ImageMetadataExtractor.get_all_metadata(img_data)
+    # 解析和隐写分析都是同步的 CPU 密集操作，放到线程中执行，避免阻塞事件循环
+    return await asyncio.to_thread(extract_img_metadata, img_data)
+
+
+def extract_img_metadata(img_data: BytesIO):
+    # 获取所有元数据（JPEG / WebP 的容器扫描结果同时用于判断是否需要隐写分析）
+    scan_result = ContainerMetadataScanner.scan(img_data)
+    exif = ImageMetadataExtractor.get_all_metadata(img_data, scan_result)
     # print("exif:",exif)
 
     # 检查是否有 Comment 字段，如果有则直接返回 exif
-    if 'stable_diffusion_metadata' in exif:
-    # 如果 'stable_diffusion_metadata' 存在，则继续检查是否有 Comment
-        if 'Comment' in exif and exif['Comment']:  # 检查 Comment 是否存在且非空
-            exif_cn = MetadataTranslator.translate_to_chinese(exif)
+    sd_metadata = exif.get('stable_diffusion_metadata') or {}
+    if sd_metadata.get('Comment'):  # 检查 Comment 是否存在且非空
+        exif_cn = MetadataTranslator.translate_to_chinese(exif)
         # print("exif_cn:",exif_cn)
-            return exif_cn  # 如果有 Comment 字段，直接返回 exif
+        return exif_cn  # 如果有 Comment 字段，直接返回 exif
+
+    # JPEG 和不带 alpha 的 WebP 不可能携带 LSB 隐写数据；容器中已有生成信息时也不再分析。
+    # 这两种情况直接返回容器扫描结果，避免整图解码
+    if scan_result is not None and (not scan_result['alpha'] or sd_metadata):
+        return MetadataTranslator.translate_to_chinese(exif)
 
     # 如果没有 Comment 字段，调用隐写分析逻辑
     rs = Reading_Steganography.main(img_data)
+    # 没有隐写数据（或数据无效）时直接返回 exif
+    if not isinstance(rs, dict) or not isinstance(rs.get('Comment'), str):
+        return MetadataTranslator.translate_to_chinese(exif)
     # 使用json.loads()将Comment字段中的字符串解析为字典
-    comment_data = json.loads(rs['Comment'])
+    try:
+        comment_data = json.loads(rs['Comment'])
+    except json.JSONDecodeError:
+        return MetadataTranslator.translate_to_chinese(exif)
+    # 生成信息必须是 JSON 对象，其它类型视为无效数据
+    if not isinstance(comment_data, dict):
+        return MetadataTranslator.translate_to_chinese(exif)
 
 # 更新rs字典中的Comment字段
     rs['Comment'] = comment_data
@@ -68,6 +91,34 @@ async def img_metadata(img_data: BytesIO):
 
 
 
+# 入库时从生成信息中保留的字段
+REQUIRED_FIELDS = ["提示词", "步数", "缩放", "采样器", "SM", "SM动态", "宽度", "高度", "负面"]
+# 入库字段在生成信息中的实际键名（steps 被翻译为“步骤”）
+FIELD_SOURCES = {"步数": "步骤"}
+
+
+def build_tag_document(generation_info: dict) -> dict:
+    """从生成信息中提取需要入库的字段，只保留非 None 的值"""
+    tag_document = {}
+
+    # 从生成信息中提取字段
+    for field in REQUIRED_FIELDS:
+        value = generation_info.get(field, generation_info.get(FIELD_SOURCES.get(field)))
+        if value is not None:  # 只取非None值，布尔值会被视作有效值
+            tag_document[field] = value
+    return tag_document
+
+
+def content_hash(img_data: BytesIO) -> str:
+    """图片内容的 SHA-256，入库时记录为“内容哈希”，用于识别重复入库"""
+    return hashlib.sha256(img_data.getbuffer()).hexdigest()
+
+
+def stored_file_name(index: int) -> str:
+    """入库图片的文件名，按照序号生成"""
+    return f"{index}.png"
+
+
 async def save_db(img_data: BytesIO) -> Optional[str]:
     # 提取 tags（实际中应该用你已有的 img_metadata 函数）
     tags = await img_metadata(img_data)  # 假设传入的 tag 已经是提取过的
@@ -78,28 +129,24 @@ async def save_db(img_data: BytesIO) -> Optional[str]:
     print(type(generation_info))
     print("生成信息：",generation_info)
 
-    # 要求的字段
-    required_fields = ["提示词", "步数", "缩放", "采样器", "SM", "SM动态", "宽度", "高度", "负面"]
-
-    # 创建一个新字典，只包括那些非空且符合要求的字段
-    tag_document = {}
-
-    # 从生成信息中提取字段
-    for field in required_fields:
-        value = generation_info.get(field)
-        if value is not None:  # 只取非None值，布尔值会被视作有效值
-            tag_document[field] = value
+    tag_document = build_tag_document(generation_info)
 
     # 如果 tag_document 为空，则返回提取为空
     if not tag_document:
         return f"提取为空,提取前为：{tags}"
 
+    # 相同内容已经入库时直接返回已有文件名（任务重启后重新执行也不会重复入库）
+    tag_document["内容哈希"] = content_hash(img_data)
+    existing = await collection.find_one({"内容哈希": tag_document["内容哈希"]}, {"文件名": 1})
+    if existing:
+        return f"文件已存在，文件名：{existing.get('文件名')}"
+
     # 获取数据库中下一个图片文件名（通过序号）
     last_image = await collection.find_one(sort=[("序号", -1)])  # 查找序号最大（最新的）文档
     next_index = 1 if not last_image else last_image.get("序号", 0) + 1
 
     # 图片保存路径
-    file_name = f"{next_index}.png"  # 图片文件名按照序号生成
+    file_name = stored_file_name(next_index)  # 图片文件名按照序号生成
     file_path = os.path.join(UPLOAD_FOLDER, file_name)
     # 确保上传目录存在
     if not os.path.exists(UPLOAD_FOLDER):
@@ -114,6 +161,8 @@ async def save_db(img_data: BytesIO) -> Optional[str]:
 
     # 存储元数据到数据库
     await collection.insert_one(tag_document)
+    # 更新统计计数
+    await increment_stats([tag_document])
 
     return f"文件保存成功，文件名：{file_name}"
 
@@ -0,0 +1,229 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from io import BytesIO
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastapi import HTTPException, UploadFile
+
+from app.api_server.img_jx import UPLOAD_FOLDER, img_metadata, save_db
+from app.api_server.response import FastJSONResponse
+from app.api_server.route_img_jx import fetch_admitted, process_uploaded_image, run_admitted
+from app.db.db import job_collection
+from app.utils.admission import RETRY_AFTER
+
+# 异步任务配置（可通过环境变量覆盖）
+JOB_WORKERS = int(os.environ.get("IMG_JX_JOB_WORKERS", 4))  # 后台 worker 数量
+JOB_QUEUE_SIZE = int(os.environ.get("IMG_JX_JOB_QUEUE_SIZE", 1000))  # 最大排队任务数
+JOB_FOLDER = os.environ.get("IMG_JX_JOB_FOLDER", os.path.join(UPLOAD_FOLDER, "jobs"))  # 上传图片的暂存目录
+CALLBACK_TIMEOUT = float(os.environ.get("IMG_JX_CALLBACK_TIMEOUT", 10))  # 回调请求超时（秒）
+
+# MongoDB（BSON）整数的取值范围
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+# 任务状态
+STATUS_QUEUED = "排队中"
+STATUS_RUNNING = "处理中"
+STATUS_DONE = "完成"
+STATUS_FAILED = "失败"
+
+# 任务可执行的操作
+OPERATIONS = {
+    "img_jx": img_metadata,
+    "img_jx_and_db": save_db,
+}
+
+
+def to_document_value(value: Any) -> Any:
+    """转换为可存入 MongoDB 的值（EXIF 中的整数键、bytes 值，超出 64 位的整数转为字符串）"""
+    return _to_bson_int(json.loads(FastJSONResponse.dumps(value)))
+
+
+def _to_bson_int(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _to_bson_int(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_to_bson_int(item) for item in value]
+    if isinstance(value, int) and not isinstance(value, bool) and not INT64_MIN <= value <= INT64_MAX:
+        return str(value)
+    return value
+
+
+class JobManager:
+    """
+    进程内异步任务队列。
+
+    任务状态持久化在 MongoDB 的 jobs 集合中，上传的图片暂存在 JOB_FOLDER；
+    内存中的 asyncio.Queue 只保存任务 ID。服务重启时，未完成（排队中/处理中）的任务会重新入队；
+    save_db 按内容哈希跳过已入库的图片，入库后、标记完成前中断的任务重新执行也不会重复入库。
+    恢复完成（ready）之前不接受新任务，任务执行同样经过下载、解码两个准入阶段。
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_queue: int = JOB_QUEUE_SIZE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.queue: Optional[asyncio.Queue] = None
+        self.ready = False
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """启动 worker（不访问数据库），未完成的任务由 recover 恢复"""
+        self.queue = asyncio.Queue()
+        self.ready = False
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def recover(self):
+        """将上次未完成的任务重新入队，之后才开始接受新任务"""
+        # 先完整读取再入队：读取中途失败重试时不会重复入队
+        pending = await job_collection.find(
+            {"状态": {"$in": [STATUS_QUEUED, STATUS_RUNNING]}}, {"_id": 1}
+        ).sort("创建时间", 1).to_list(length=None)
+        for job in pending:
+            self.queue.put_nowait(job["_id"])
+        if pending:
+            print(f"恢复未完成任务: {len(pending)} 个")
+        self.ready = True
+
+    async def stop(self):
+        """停止 worker；正在处理的任务保持“处理中”，下次启动时重新执行"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "就绪": self.ready,
+            "worker": self.workers,
+            "排队中": self.queue.qsize() if self.queue else 0,
+            "队列上限": self.max_queue,
+        }
+
+    async def submit(
+            self,
+            operation: str,
+            url: Optional[str] = None,
+            file: Optional[UploadFile] = None,
+            callback_url: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """提交任务，立即返回任务 ID"""
+        if operation not in OPERATIONS:
+            raise HTTPException(status_code=400, detail=f"不支持的操作: {operation}")
+        if not url and not file:
+            raise HTTPException(status_code=400, detail="必须提供图片 URL 或 上传图片文件")
+        if self.queue is None or not self.ready:
+            raise HTTPException(
+                status_code=503,
+                detail="任务队列未就绪，请稍后重试",
+                headers={"Retry-After": str(RETRY_AFTER)},
+            )
+        if self.queue.qsize() >= self.max_queue:
+            raise HTTPException(
+                status_code=503,
+                detail="任务队列已满，请稍后重试",
+                headers={"Retry-After": str(RETRY_AFTER)},
+            )
+
+        job_id = uuid.uuid4().hex
+        file_path = None
+        if not url:
+            # 上传的图片先落盘，保证服务崩溃后任务仍可恢复
+            image_data = await process_uploaded_image(file)
+            if not os.path.exists(JOB_FOLDER):
+                os.makedirs(JOB_FOLDER)
+            file_path = os.path.join(JOB_FOLDER, f"{job_id}.bin")
+            with open(file_path, "wb") as f:
+                f.write(image_data.getbuffer())
+
+        now = time.time()
+        job = {
+            "_id": job_id,
+            "操作": operation,
+            "URL": url,
+            "文件": file_path,
+            "回调": callback_url,
+            "状态": STATUS_QUEUED,
+            "结果": None,
+            "错误": None,
+            "创建时间": now,
+            "更新时间": now,
+        }
+        await job_collection.insert_one(job)
+        self.queue.put_nowait(job_id)
+        return {"任务ID": job_id, "状态": STATUS_QUEUED}
+
+    async def get(self, job_id: str) -> Dict[str, Any]:
+        """查询任务状态"""
+        job = await job_collection.find_one({"_id": job_id}, {"文件": 0})
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"任务不存在: {job_id}")
+        job["任务ID"] = job.pop("_id")
+        return job
+
+    async def _update(self, job_id: str, **fields):
+        fields["更新时间"] = time.time()
+        await job_collection.update_one({"_id": job_id}, {"$set": fields})
+
+    async def _worker(self):
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                print(f"任务 {job_id} 执行异常: {e}")
+            finally:
+                self.queue.task_done()
+
+    @staticmethod
+    async def _retry_overloaded(func, *args):
+        """准入阶段繁忙（503）时等待后重试：后台任务不应因为瞬时过载而失败"""
+        while True:
+            try:
+                return await func(*args)
+            except HTTPException as e:
+                if e.status_code != 503:
+                    raise
+                await asyncio.sleep(RETRY_AFTER)
+
+    async def _load_image(self, job: Dict[str, Any]) -> BytesIO:
+        if job.get("URL"):
+            return await self._retry_overloaded(fetch_admitted, job["URL"])
+        with open(job["文件"], "rb") as f:
+            return BytesIO(f.read())
+
+    async def _run(self, job_id: str):
+        job = await job_collection.find_one({"_id": job_id})
+        if job is None or job["状态"] in (STATUS_DONE, STATUS_FAILED):
+            return
+
+        await self._update(job_id, 状态=STATUS_RUNNING)
+        try:
+            image_data = await self._load_image(job)
+            # 与在线请求共用解码槽位，限制总的并行解码数
+            result = await self._retry_overloaded(run_admitted, OPERATIONS[job["操作"]], image_data)
+            update = {"状态": STATUS_DONE, "结果": to_document_value(result)}
+        except HTTPException as e:
+            update = {"状态": STATUS_FAILED, "错误": e.detail}
+        except Exception as e:
+            update = {"状态": STATUS_FAILED, "错误": str(e)}
+
+        await self._update(job_id, **update)
+        if job.get("文件") and os.path.exists(job["文件"]):
+            os.remove(job["文件"])
+        if job.get("回调"):
+            await self._notify(job["回调"], job_id, update)
+
+    async def _notify(self, callback_url: str, job_id: str, update: Dict[str, Any]):
+        """任务结束后向回调地址 POST 任务结果"""
+        payload = {"任务ID": job_id, **update}
+        try:
+            async with httpx.AsyncClient(timeout=CALLBACK_TIMEOUT) as client:
+                await client.post(callback_url, json=payload)
+        except httpx.HTTPError as e:
+            print(f"任务 {job_id} 回调失败: {e}")
+
+
+job_manager = JobManager()
@@ -0,0 +1,130 @@
+import base64
+import json
+from typing import Any, Dict, List, Optional
+
+import orjson
+from fastapi.responses import FileResponse, ORJSONResponse
+from pydantic import BaseModel
+from starlette.types import Receive, Scope, Send
+
+
+class ImageJxResponse(BaseModel):
+    """接口统一返回结构（用于 OpenAPI 文档）"""
+    状态: str
+    返回: Any
+
+
+class FastJSONResponse(ORJSONResponse):
+    """使用 orjson 序列化的响应，额外处理 EXIF 中的 bytes 值"""
+
+    @staticmethod
+    def _default(value: Any) -> Any:
+        if isinstance(value, (bytes, bytearray)):
+            # 可读文本直接返回，二进制内容（如 MakerNote）使用 base64
+            try:
+                return bytes(value).decode("utf-8")
+            except UnicodeDecodeError:
+                return base64.b64encode(value).decode("ascii")
+        raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+    @staticmethod
+    def dumps(content: Any) -> bytes:
+        """序列化为 JSON 字节；orjson 只支持 64 位整数，超出范围时（如超大 seed）回退到标准库 json"""
+        try:
+            return orjson.dumps(
+                content,
+                default=FastJSONResponse._default,
+                option=orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            return json.dumps(
+                content,
+                default=FastJSONResponse._default,
+                ensure_ascii=False,
+                separators=(",", ":"),
+            ).encode("utf-8")
+
+    def render(self, content: Any) -> bytes:
+        return FastJSONResponse.dumps(content)
+
+
+class ZeroCopyFileResponse(FileResponse):
+    """
+    文件响应：服务器支持 ASGI zerocopysend 扩展时整文件用 sendfile 发送，
+    否则（以及 Range 请求）回退到 FileResponse 的分块读取。
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self._zerocopy = "http.response.zerocopysend" in scope.get("extensions", {})
+        await super().__call__(scope, receive, send)
+
+    async def _handle_simple(self, send: Send, send_header_only: bool) -> None:
+        if not self._zerocopy or send_header_only:
+            return await super()._handle_simple(send, send_header_only)
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        with open(self.path, "rb") as file:
+            await send({"type": "http.response.zerocopysend", "file": file, "more_body": False})
+
+
+def parse_fields(fields: Optional[str]) -> List[List[str]]:
+    """将 "生成信息.提示词,生成信息.种子" 解析为路径列表"""
+    if not fields:
+        return []
+    return [
+        [part for part in path.strip().split(".") if part]
+        for path in fields.split(",")
+        if path.strip()
+    ]
+
+
+def _locate(data: Dict[str, Any], key: str) -> Optional[List[str]]:
+    """广度优先查找 key 所在的位置，返回从根开始的路径（用于省略外层键的写法）"""
+    queue = [([], data)]
+    while queue:
+        prefix, node = queue.pop(0)
+        if key in node:
+            return prefix + [key]
+        for child_key, child in node.items():
+            if isinstance(child, dict):
+                queue.append((prefix + [child_key], child))
+    return None
+
+
+def select_fields(data: Any, fields: Optional[str]) -> Any:
+    """
+    按字段路径投影返回数据，只保留请求的字段。
+
+    路径以 "." 分隔，可以省略外层键，例如 "生成信息.提示词" 会自动定位到
+    "稳定扩散(stable_diffusion)或novelai元数据.生成信息.提示词"。结果保持原有的嵌套结构，
+    不存在的路径会被忽略。
+    """
+    paths = parse_fields(fields)
+    if not paths or not isinstance(data, dict):
+        return data
+
+    selected: Dict[str, Any] = {}
+    # 先写入较长的路径，较短的路径（整个子树）随后覆盖，避免修改原始数据
+    for path in sorted(paths, key=len, reverse=True):
+        full_path = _locate(data, path[0])
+        if full_path is None:
+            continue
+        full_path = full_path[:-1] + path
+
+        # 沿路径取值
+        value: Any = data
+        for key in full_path:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            # 按原结构写入结果
+            target = selected
+            for key in full_path[:-1]:
+                target = target.setdefault(key, {})
+            target[full_path[-1]] = value
+    return selected
+
+
+def success_response(result: Any, fields: Optional[str] = None) -> FastJSONResponse:
+    """构造成功响应"""
+    return FastJSONResponse({"状态": "成功", "返回": select_fields(result, fields)})
@@ -1,10 +1,20 @@
+import asyncio
+import json
 import ssl
 from typing import Optional
 
 from fastapi import HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
 from io import BytesIO
 import httpx  # 使用 httpx 进行异步 HTTP 请求
 from app.api_server.img_jx import img_metadata, save_db
+from app.api_server.response import success_response
+from app.core.s import Steganography
+from app.utils.admission import AdmissionController
+from app.utils.single_flight import SingleFlight
+
+# 并发的相同只读请求（相同 URL 或相同上传内容）只执行一次，仅用于 /api/img_jx
+img_jx_flight = SingleFlight()
 
 
 # 处理 URL 获取图片并转换为 io.BytesIO 流
@@ -18,13 +28,22 @@ async def fetch_image_from_url(url: str) -> BytesIO:
 
         # 使用自定义的 SSLContext 进行请求
         async with httpx.AsyncClient(verify=context) as client:  # 传递 SSLContext
-            response = await client.get(url)
-            response.raise_for_status()  # 如果请求失败，抛出异常
-            # print("HTTP 响应类型:",type(response.content) )
+            # 流式读取响应，超过大小上限时立即中止下载
+            async with client.stream("GET", url) as response:
+                response.raise_for_status()  # 如果请求失败，抛出异常
+                content_length = response.headers.get("Content-Length")
+                if content_length and content_length.isdigit():
+                    AdmissionController.check_byte_size(int(content_length))
 
-            # 将图片内容转为 BytesIO 流
-            img_data = BytesIO(response.content)
-            return img_data
+                # 将图片内容写入 BytesIO 流
+                img_data = BytesIO()
+                async for chunk in response.aiter_bytes():
+                    img_data.write(chunk)
+                    AdmissionController.check_byte_size(img_data.tell())
+                img_data.seek(0)
+                return img_data
+    except HTTPException:
+        raise
     except httpx.RequestError as e:
         # 捕获 httpx 请求错误
         raise HTTPException(status_code=400, detail=f"无法从 URL 获取图片: {str(e)}")
@@ -35,26 +54,67 @@ async def fetch_image_from_url(url: str) -> BytesIO:
 # 处理上传的图片文件并转换为 io.BytesIO 流
 async def process_uploaded_image(file: UploadFile) -> BytesIO:
     try:
+        if file.size is not None:
+            AdmissionController.check_byte_size(file.size)
         img_data = BytesIO(await file.read())  # 将上传的图片转为 BytesIO 流
+        AdmissionController.check_byte_size(img_data.getbuffer().nbytes)
         return img_data
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"上传图片处理失败: {str(e)}")
 
 
+def _upload_key(operation: str, image_data: BytesIO) -> tuple:
+    """上传图片的合并键：操作名 + 内容哈希"""
+    with image_data.getbuffer() as view:
+        return operation, SingleFlight.content_key(view)
+
+
+def _url_key(operation: str, url: str) -> tuple:
+    """URL 图片的合并键：操作名 + 规范化 URL"""
+    return operation, SingleFlight.normalize_url(url)
+
+
+async def run_admitted(func, image_data: BytesIO):
+    """检查图片尺寸限制后，占用解码槽位执行 func(image_data)"""
+    AdmissionController.check_image_limits(image_data)
+    async with AdmissionController.decode.acquire():
+        return await func(image_data)
+
+
+async def fetch_admitted(url: str) -> BytesIO:
+    """占用下载槽位获取 URL 图片"""
+    async with AdmissionController.fetch.acquire():
+        return await fetch_image_from_url(url)
+
+
+async def _metadata_from_url(url: str):
+    image_data = await fetch_admitted(url)
+    return await run_admitted(img_metadata, image_data)
+
+
+async def _save_db_from_url(url: str):
+    image_data = await fetch_admitted(url)
+    return await run_admitted(save_db, image_data)
+
+
 async def image_jx(
         url: Optional[str] = None,  # 可选的 URL 查询参数
-        file: Optional[UploadFile] = None  # 可选的上传文件
+        file: Optional[UploadFile] = None,  # 可选的上传文件
+        fields: Optional[str] = None  # 可选的字段投影，如 "生成信息.提示词,生成信息.种子"
 ):
     if url:
         # 如果提供了 URL，尝试获取该 URL 的图片
-        image_data = await fetch_image_from_url(url)
-        img_metadata_url=await img_metadata(image_data)
-        return {f"状态：成功,返回：{img_metadata_url}"}
+        img_metadata_url = await img_jx_flight.do(_url_key("img_jx", url), lambda: _metadata_from_url(url))
+        return success_response(img_metadata_url, fields)
     elif file:
     # 如果提供了文件，处理上传的图片
         image_data = await process_uploaded_image(file)
-        img_metadata_file=await img_metadata(image_data)
-        return {f"状态：成功,返回：{img_metadata_file}"}
+        img_metadata_file = await img_jx_flight.do(
+            _upload_key("img_jx", image_data), lambda: run_admitted(img_metadata, image_data)
+        )
+        return success_response(img_metadata_file, fields)
     else:
         raise HTTPException(status_code=400, detail="必须提供图片 URL 或 上传图片文件")
 
@@ -63,19 +123,49 @@ async def image_jx(
 
 async def img_jx_and_db(
         url: Optional[str] = None,  # 可选的 URL 查询参数
-        file: Optional[UploadFile] = None  # 可选的上传文件
+        file: Optional[UploadFile] = None,  # 可选的上传文件
+        fields: Optional[str] = None  # 可选的字段投影
 ):
+    # 入库会写数据，不做请求合并：合并后多个请求共享同一结果，是否入库取决于请求时机
     if url:
         # 如果提供了 URL，尝试获取该 URL 的图片
         # print(url)
-        image_data = await fetch_image_from_url(url)
-        返回=await save_db(image_data)
-        return {f"状态：成功,返回：{返回}"}
+        返回 = await _save_db_from_url(url)
+        return success_response(返回, fields)
     elif file:
         # 如果提供了文件，处理上传的图片
         image_data = await process_uploaded_image(file)
-        返回=await save_db(image_data)
-        return {f"状态：成功,返回：{返回}"}
+        返回 = await run_admitted(save_db, image_data)
+        return success_response(返回, fields)
+
+
+async def img_rjx(
+        file: UploadFile,  # 需要嵌入数据的图片
+        metadata: str,  # JSON 格式的元数据字典
+        compress_level: int = 6,  # PNG 压缩级别 0~9，越小越快
+        text_chunk: bool = False  # 是否同时写入 tEXt 块
+):
+    if not 0 <= compress_level <= 9:
+        raise HTTPException(status_code=400, detail="compress_level 必须在 0~9 之间")
+    try:
+        data = json.loads(metadata)
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"metadata 不是有效的 JSON: {str(e)}")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="metadata 必须是 JSON 对象")
 
+    def render(image_data: BytesIO) -> BytesIO:
+        # 在内存中嵌入数据并编码为 PNG，全程不落盘
+        try:
+            img = Steganography.embed_data_into_image(image_data, data)
+            return Steganography.save_to_buffer(img, compress_level, data if text_chunk else None)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
+    async def embed(image_data: BytesIO) -> BytesIO:
+        # 解码、嵌入和 PNG 编码都是 CPU 密集操作，放到线程中执行，避免阻塞事件循环
+        return await asyncio.to_thread(render, image_data)
 
+    image_data = await process_uploaded_image(file)
+    buffer = await run_admitted(embed, image_data)
+    return StreamingResponse(Steganography.iter_buffer(buffer), media_type="image/png")
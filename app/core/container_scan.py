@@ -0,0 +1,276 @@
+import json
+import os
+import struct
+import xml.etree.ElementTree as ET
+from io import BytesIO
+from typing import Any, BinaryIO, Dict, List, Optional, Union
+
+
+class ContainerMetadataScanner:
+    """
+    JPEG / WebP 容器级元数据扫描器。
+
+    只按段（segment）/ 块（chunk）读取文件头部结构，遇到像素数据直接 seek 跳过，
+    不会调用 Pillow 解码图像，输出结构与 ImageMetadataExtractor.get_all_metadata 保持一致。
+    """
+
+    # JPEG APP1 段的标识前缀
+    EXIF_PREFIX = b"Exif\x00\x00"
+    XMP_PREFIX = b"http://ns.adobe.com/xap/1.0/\x00"
+
+    # 不带长度字段的 JPEG 标记：TEM、RST0~RST7、SOI
+    JPEG_STANDALONE_MARKERS = {0x01, 0xD8} | set(range(0xD0, 0xD8))
+    # SOF 标记（排除 DHT=C4、JPG=C8、DAC=CC）
+    JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+    # 单个元数据块允许读取的最大字节数，防止畸形文件声明超大块
+    MAX_METADATA_CHUNK = 4 * 1024 * 1024
+
+    # XMP 中可能携带生成信息的字段（本地名）
+    XMP_TEXT_FIELDS = ("UserComment", "parameters", "description", "Comment")
+
+    @staticmethod
+    def detect_format(header: bytes) -> Optional[str]:
+        """根据文件头魔数判断容器格式，返回 Pillow 风格的格式名"""
+        if header[:3] == b"\xff\xd8\xff":
+            return "JPEG"
+        if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+            return "WEBP"
+        return None
+
+    @staticmethod
+    def _open_stream(input_data: Union[str, bytes, BytesIO]) -> Optional[BinaryIO]:
+        """将输入统一为可 seek 的二进制流"""
+        if isinstance(input_data, str):
+            return open(input_data, "rb")
+        if isinstance(input_data, bytes):
+            return BytesIO(input_data)
+        if isinstance(input_data, BytesIO):
+            return input_data
+        return None
+
+    @staticmethod
+    def scan(input_data: Union[str, bytes, BytesIO]) -> Optional[Dict[str, Any]]:
+        """
+        扫描 JPEG 或 WebP 容器，提取尺寸和元数据块。
+
+        返回:
+            Dict 或 None: 包含 format、width、height、alpha（是否带 alpha 通道）、exif（原始字节）、
+                          xmp（字符串）、comments（字符串列表）的字典；不是 JPEG/WebP 或解析失败时返回 None。
+        """
+        stream = ContainerMetadataScanner._open_stream(input_data)
+        if stream is None:
+            return None
+
+        position = stream.tell()
+        try:
+            stream.seek(0)
+            header = stream.read(12)
+            image_format = ContainerMetadataScanner.detect_format(header)
+            if image_format == "JPEG":
+                stream.seek(2)
+                return ContainerMetadataScanner.scan_jpeg(stream)
+            if image_format == "WEBP":
+                return ContainerMetadataScanner.scan_webp(stream)
+            return None
+        except (OSError, ValueError, struct.error) as e:
+            print(f"容器元数据扫描失败: {e}")
+            return None
+        finally:
+            # 路径输入由这里打开，需要关闭；内存流则恢复原读取位置，避免影响后续处理
+            if isinstance(input_data, str):
+                stream.close()
+            else:
+                stream.seek(position)
+
+    @staticmethod
+    def _new_result(image_format: str) -> Dict[str, Any]:
+        return {
+            "format": image_format,
+            "width": None,
+            "height": None,
+            "alpha": False,
+            "exif": None,
+            "xmp": None,
+            "comments": [],
+        }
+
+    @staticmethod
+    def _read_exact(stream: BinaryIO, size: int) -> bytes:
+        data = stream.read(size)
+        if len(data) != size:
+            raise ValueError("文件被截断")
+        return data
+
+    @staticmethod
+    def scan_jpeg(stream: BinaryIO) -> Dict[str, Any]:
+        """逐段扫描 JPEG（调用前流位置应在 SOI 之后），遇到 SOS 即停止"""
+        result = ContainerMetadataScanner._new_result("JPEG")
+        read_exact = ContainerMetadataScanner._read_exact
+
+        while True:
+            byte = stream.read(1)
+            if not byte:
+                break
+            if byte != b"\xff":
+                raise ValueError("JPEG 段标记错误")
+            # 跳过填充字节 0xFF
+            marker = 0xFF
+            while marker == 0xFF:
+                next_byte = stream.read(1)
+                if not next_byte:
+                    return result
+                marker = next_byte[0]
+
+            if marker in ContainerMetadataScanner.JPEG_STANDALONE_MARKERS:
+                continue
+            # SOS 之后是熵编码数据，EOI 为文件结束，元数据已全部读完
+            if marker in (0xDA, 0xD9):
+                break
+
+            length = struct.unpack(">H", read_exact(stream, 2))[0]
+            if length < 2:
+                raise ValueError("JPEG 段长度错误")
+            payload_size = length - 2
+
+            if marker in ContainerMetadataScanner.JPEG_SOF_MARKERS:
+                # 精度(1) + 高度(2) + 宽度(2)
+                sof = read_exact(stream, 5)
+                result["height"], result["width"] = struct.unpack(">HH", sof[1:5])
+                stream.seek(payload_size - 5, os.SEEK_CUR)
+            elif marker == 0xE1:
+                payload = read_exact(stream, payload_size)
+                if payload.startswith(ContainerMetadataScanner.EXIF_PREFIX):
+                    # 与 Pillow 一致，只保留第一个 EXIF 段
+                    if result["exif"] is None:
+                        result["exif"] = payload
+                elif payload.startswith(ContainerMetadataScanner.XMP_PREFIX):
+                    if result["xmp"] is None:
+                        xmp = payload[len(ContainerMetadataScanner.XMP_PREFIX):]
+                        result["xmp"] = xmp.decode("utf-8", errors="replace")
+            elif marker == 0xFE:
+                payload = read_exact(stream, payload_size)
+                result["comments"].append(payload.rstrip(b"\x00").decode("utf-8", errors="replace"))
+            else:
+                stream.seek(payload_size, os.SEEK_CUR)
+
+        return result
+
+    @staticmethod
+    def scan_webp(stream: BinaryIO) -> Dict[str, Any]:
+        """逐块扫描 WebP 的 RIFF 结构，图像数据块只读取头部尺寸字段"""
+        result = ContainerMetadataScanner._new_result("WEBP")
+        read_exact = ContainerMetadataScanner._read_exact
+
+        stream.seek(4)
+        riff_size = struct.unpack("<I", read_exact(stream, 4))[0]
+        end = 8 + riff_size
+        stream.seek(12)
+
+        while stream.tell() + 8 <= end:
+            header = stream.read(8)
+            if len(header) < 8:
+                break
+            fourcc, size = header[:4], struct.unpack("<I", header[4:])[0]
+            # RIFF 块按偶数字节对齐
+            next_chunk = stream.tell() + size + (size & 1)
+
+            if fourcc == b"VP8X" and size >= 10:
+                data = read_exact(stream, 10)
+                # 标志字节第 4 位表示图像带 alpha 通道
+                result["alpha"] = result["alpha"] or bool(data[0] & 0x10)
+                result["width"] = int.from_bytes(data[4:7], "little") + 1
+                result["height"] = int.from_bytes(data[7:10], "little") + 1
+            elif fourcc == b"VP8 " and size >= 10 and result["width"] is None:
+                data = read_exact(stream, 10)
+                if data[3:6] == b"\x9d\x01\x2a":
+                    width, height = struct.unpack("<HH", data[6:10])
+                    result["width"], result["height"] = width & 0x3FFF, height & 0x3FFF
+            elif fourcc == b"VP8L" and size >= 5 and result["width"] is None:
+                data = read_exact(stream, 5)
+                if data[0] == 0x2F:
+                    bits = int.from_bytes(data[1:5], "little")
+                    result["width"] = (bits & 0x3FFF) + 1
+                    result["height"] = ((bits >> 14) & 0x3FFF) + 1
+                    result["alpha"] = result["alpha"] or bool((bits >> 28) & 1)
+            elif fourcc == b"ALPH":
+                result["alpha"] = True
+            elif fourcc in (b"EXIF", b"XMP ") and size <= ContainerMetadataScanner.MAX_METADATA_CHUNK:
+                payload = read_exact(stream, size)
+                if fourcc == b"EXIF":
+                    result["exif"] = payload
+                else:
+                    result["xmp"] = payload.decode("utf-8", errors="replace")
+
+            stream.seek(next_chunk)
+
+        return result
+
+    @staticmethod
+    def decode_user_comment(value: bytes) -> Optional[str]:
+        """解码 EXIF UserComment：前 8 字节为字符集标识，其后为文本"""
+        if not isinstance(value, bytes) or len(value) <= 8:
+            return None
+        charset, body = value[:8], value[8:]
+        try:
+            if charset.startswith(b"UNICODE"):
+                # 标准为 UTF-16，未规定字节序；根据 BOM 或零字节位置判断
+                if body[:2] in (b"\xfe\xff", b"\xff\xfe"):
+                    text = body.decode("utf-16")
+                elif body[0] == 0:
+                    text = body.decode("utf-16-be")
+                else:
+                    text = body.decode("utf-16-le")
+            else:
+                text = body.decode("utf-8", errors="replace")
+        except UnicodeDecodeError:
+            return None
+        text = text.rstrip("\x00").strip()
+        return text or None
+
+    @staticmethod
+    def extract_xmp_texts(xmp: str) -> List[str]:
+        """从 XMP 包中提取可能携带生成信息的文本字段"""
+        try:
+            root = ET.fromstring(xmp.strip().rstrip("\x00"))
+        except ET.ParseError:
+            return []
+
+        texts = []
+        for element in root.iter():
+            # 字段既可能是属性，也可能是子元素（rdf:Alt/rdf:li 中的文本）
+            for name, value in element.attrib.items():
+                if name.rsplit("}", 1)[-1] in ContainerMetadataScanner.XMP_TEXT_FIELDS and value.strip():
+                    texts.append(value.strip())
+            if element.tag.rsplit("}", 1)[-1] in ContainerMetadataScanner.XMP_TEXT_FIELDS:
+                text = "".join(element.itertext()).strip()
+                if text:
+                    texts.append(text)
+        return texts
+
+    @staticmethod
+    def to_text_metadata(user_comment: Optional[str], scan_result: Dict[str, Any]) -> Dict[str, str]:
+        """
+        将 UserComment、XMP、COM 中的文本整理为与 PNG tEXt 相同的键值结构。
+
+        JSON 对象（NovelAI 格式）放入 Comment，其余文本（WebUI 格式）放入 parameters，
+        优先级依次为 UserComment、XMP、COM。
+        """
+        candidates = []
+        if user_comment:
+            candidates.append(user_comment)
+        if scan_result.get("xmp"):
+            candidates.extend(ContainerMetadataScanner.extract_xmp_texts(scan_result["xmp"]))
+        candidates.extend(comment for comment in scan_result.get("comments", []) if comment.strip())
+
+        metadata = {}
+        for text in candidates:
+            key = "parameters"
+            if text.lstrip().startswith("{"):
+                try:
+                    if isinstance(json.loads(text), dict):
+                        key = "Comment"
+                except json.JSONDecodeError:
+                    pass
+            metadata.setdefault(key, text)
+        return metadata
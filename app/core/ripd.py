@@ -7,6 +7,8 @@ import piexif
 from PIL import Image
 from PIL.PngImagePlugin import PngImageFile
 
+from app.core.container_scan import ContainerMetadataScanner
+
 
 class ImageMetadataExtractor:
 
@@ -45,6 +47,11 @@ class ImageMetadataExtractor:
     @staticmethod
     def extract_exif(input_data: Union[str, bytes]) -> Optional[Dict[str, Any]]:
         """提取 EXIF 数据，支持文件路径或二进制流"""
+        # JPEG / WebP 直接从容器段中读取 EXIF，无需经过 Pillow
+        scan_result = ContainerMetadataScanner.scan(input_data)
+        if scan_result is not None:
+            return ImageMetadataExtractor._load_exif_bytes(scan_result["exif"])
+
         image = ImageMetadataExtractor._load_image(input_data)
         if image and 'exif' in image.info:
             try:
@@ -54,6 +61,16 @@ class ImageMetadataExtractor:
         return None
 
     @staticmethod
+    def _load_exif_bytes(exif_bytes: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        """将原始 EXIF 字节解析为字典"""
+        if not exif_bytes:
+            return None
+        try:
+            return piexif.load(exif_bytes)
+        except Exception as e:
+            print(f"提取 EXIF 数据失败: {e}")
+        return None
+
     @staticmethod
     def extract_png_metadata(input_data: Union[str, bytes]) -> Dict[str, str]:
         """从 PNG 图像中提取元数据（tEXt 或 iTXt），支持文件路径或二进制流"""
@@ -117,13 +134,26 @@ class ImageMetadataExtractor:
             return {}
 
     @staticmethod
-    def get_all_metadata(input_data: Union[str, bytes]) -> Dict[str, Any]:
-        """获取所有的元数据，包括 EXIF 和 Stable Diffusion 信息，支持文件路径或二进制流"""
-        metadata = {
-            "file_info": ImageMetadataExtractor.get_file_info(input_data),
-            "exif": ImageMetadataExtractor.extract_exif(input_data),
-            "stable_diffusion_metadata": ImageMetadataExtractor.extract_png_metadata(input_data)
-        }
+    def get_all_metadata(
+            input_data: Union[str, bytes],
+            scan_result: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        获取所有的元数据，包括 EXIF 和 Stable Diffusion 信息，支持文件路径或二进制流。
+
+        调用方已经扫描过容器时可传入 scan_result，避免重复扫描。
+        """
+        # JPEG / WebP 只扫描容器头部，不经过 Pillow 解码
+        if scan_result is None:
+            scan_result = ContainerMetadataScanner.scan(input_data)
+        if scan_result is not None:
+            metadata = ImageMetadataExtractor.get_container_metadata(input_data, scan_result)
+        else:
+            metadata = {
+                "file_info": ImageMetadataExtractor.get_file_info(input_data),
+                "exif": ImageMetadataExtractor.extract_exif(input_data),
+                "stable_diffusion_metadata": ImageMetadataExtractor.extract_png_metadata(input_data)
+            }
         #print(f"原始sdm：{ImageMetadataExtractor.extract_png_metadata(input_data)}")
 
         if 'stable_diffusion_metadata' in metadata and isinstance(metadata['stable_diffusion_metadata'], dict):
@@ -135,12 +165,34 @@ class ImageMetadataExtractor:
                     metadata['stable_diffusion_metadata'][keyword] = entry
 
         # 如果没有 EXIF 信息或不需要处理 EXIF，删除该键
-        if not ImageMetadataExtractor.extract_exif(input_data):
+        if not metadata.get('exif'):
             if 'exif' in metadata:
                 del metadata['exif']
 
         return metadata
 
+    @staticmethod
+    def get_container_metadata(input_data: Union[str, bytes], scan_result: Dict[str, Any]) -> Dict[str, Any]:
+        """根据 JPEG / WebP 容器扫描结果组装元数据（EXIF、UserComment、XMP、COM）"""
+        exif = ImageMetadataExtractor._load_exif_bytes(scan_result["exif"])
+        user_comment = None
+        if exif:
+            user_comment = ContainerMetadataScanner.decode_user_comment(
+                exif.get("Exif", {}).get(piexif.ExifIFD.UserComment)
+            )
+
+        return {
+            "file_info": {
+                "filename": input_data if isinstance(input_data, str) else "in-memory-image",
+                "filesize": ImageMetadataExtractor.get_file_size(input_data),
+                "image_width": scan_result["width"],
+                "image_height": scan_result["height"],
+                "format": scan_result["format"]
+            },
+            "exif": exif,
+            "stable_diffusion_metadata": ContainerMetadataScanner.to_text_metadata(user_comment, scan_result)
+        }
+
 
 class MainCoordinator:
     @staticmethod
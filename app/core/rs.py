@@ -1,11 +1,17 @@
-import gzip
 import json
 import io
+import zlib
 from PIL import Image
-from typing import Union
+from typing import Callable, Union
 
 class Reading_Steganography:
     MAGIC_NUMBER = "stealth_pngcomp"
+    MAX_COMPRESSED_BYTES = 1024 * 1024  # 隐写数据压缩后的最大字节数
+    MAX_DECOMPRESSED_BYTES = 8 * 1024 * 1024  # 隐写数据解压后的最大字节数
+    READ_CHUNK_BYTES = 64 * 1024  # 每次从像素中读取的压缩数据字节数
+
+    # 将像素值映射为其最低有效位对应的 ASCII 字符 '0' / '1'
+    LSB_ASCII_TABLE = bytes(0x30 | (value & 1) for value in range(256))
 
     class DataReader:
         def __init__(self, data):
@@ -13,6 +19,10 @@ class Reading_Steganography:
             self.data = data
             self.index = 0
 
+        def remaining_bytes(self):
+            """剩余可读取的字节数"""
+            return (len(self.data) - self.index) // 8
+
         def read_bit(self):
             """读取一个位（bit）"""
             bit = self.data[self.index]
@@ -38,7 +48,7 @@ class Reading_Steganography:
             bytes_ = []
             for _ in range(n):
                 bytes_.append(self.read_byte())
-            return bytes_
+            return bytes(bytes_)
 
         def read_int32(self):
             """读取一个 32 位整数（4 字节）"""
@@ -46,6 +56,43 @@ class Reading_Steganography:
             # 将字节转换为 32 位整数，假设数据是大端存储
             return int.from_bytes(bytes_, byteorder='big')
 
+    class AlphaBitReader:
+        """
+        按需从 alpha 通道读取最低有效位（按列优先顺序），不生成整幅图像的位列表。
+
+        每次只裁剪覆盖所需位的若干列，转置后即为列优先的连续字节，再通过查表一次性转换为位。
+        """
+
+        def __init__(self, img: Image.Image):
+            self.alpha = img.getchannel("A")
+            self.width, self.height = img.size
+            self.total_bits = self.width * self.height
+            self.index = 0
+
+        def remaining_bytes(self) -> int:
+            return (self.total_bits - self.index) // 8
+
+        def read_n_bytes(self, n: int) -> bytes:
+            """读取 n 个字节（8n 个像素的最低有效位）"""
+            if n <= 0:
+                return b""
+            end = self.index + n * 8
+            if end > self.total_bits:
+                raise ValueError("隐写数据超出图像范围")
+
+            first_column = self.index // self.height
+            last_column = (end + self.height - 1) // self.height
+            columns = self.alpha.crop((first_column, 0, last_column, self.height))
+            column_major = columns.transpose(Image.Transpose.TRANSPOSE).tobytes()
+
+            offset = self.index - first_column * self.height
+            bits = column_major[offset:offset + n * 8].translate(Reading_Steganography.LSB_ASCII_TABLE)
+            self.index = end
+            return int(bits, 2).to_bytes(n, byteorder='big')
+
+        def read_int32(self) -> int:
+            return int.from_bytes(self.read_n_bytes(4), byteorder='big')
+
     @staticmethod
     def load_image(image_path: Union[str, io.BytesIO]) -> Image.Image:
         """加载图片，只打开一次"""
@@ -89,6 +136,58 @@ class Reading_Steganography:
         print(f"读取到的魔术数字: {magic_string}")
         return magic_string
 
+    @staticmethod
+    def inflate_bounded(read_bytes: Callable[[int], bytes], compressed_length: int) -> bytes:
+        """
+        增量解压 gzip 数据，同时限制压缩数据和解压数据的大小。
+
+        read_bytes(n) 每次按需读取 n 个压缩字节；gzip 流结束后立即停止读取。
+        超出限制、数据截断或格式错误时抛出 ValueError。
+        """
+        if compressed_length > Reading_Steganography.MAX_COMPRESSED_BYTES:
+            raise ValueError(f"隐写数据声明长度过大: {compressed_length} 字节")
+
+        max_output = Reading_Steganography.MAX_DECOMPRESSED_BYTES
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)  # 16 + MAX_WBITS 表示 gzip 格式
+        output = bytearray()
+        remaining = compressed_length
+        try:
+            while remaining > 0 and not decompressor.eof:
+                chunk = read_bytes(min(Reading_Steganography.READ_CHUNK_BYTES, remaining))
+                remaining -= len(chunk)
+                output += decompressor.decompress(chunk, max_output + 1 - len(output))
+                # 还有未处理的输入说明输出已达到上限
+                if len(output) > max_output or decompressor.unconsumed_tail:
+                    raise ValueError(f"隐写数据解压后超过 {max_output} 字节")
+        except zlib.error as e:
+            raise ValueError(f"Gzip 解压缩错误: {e}")
+
+        if not decompressor.eof:
+            raise ValueError("Gzip 数据不完整")
+        return bytes(output)
+
+    @staticmethod
+    def _read_payload(reader) -> Union[dict, None]:
+        """从读取器当前位置（魔术数字之后）读取长度、解压并解析 JSON"""
+        data_length = reader.read_int32()
+        compressed_length = data_length // 8  # 假设数据长度为比特数，因此除以 8
+        try:
+            if compressed_length > reader.remaining_bytes():
+                raise ValueError(f"隐写数据声明长度超出图像范围: {compressed_length} 字节")
+            decompressed_data = Reading_Steganography.inflate_bounded(reader.read_n_bytes, compressed_length)
+
+            # 解压后的数据解析为 JSON
+            json_string = decompressed_data.decode('utf-8')
+            json_data = json.loads(json_string)
+            if not isinstance(json_data, dict):
+                raise ValueError(f"隐写数据不是 JSON 对象: {type(json_data).__name__}")
+            return json_data
+
+        except ValueError as e:
+            # UnicodeDecodeError 和 JSONDecodeError 也是 ValueError
+            print(f"解压或解析数据时出错: {e}")
+        return None
+
     @staticmethod
     def extract_stealth_data(lowest_data) -> Union[dict, None]:
         """提取隐藏的有效数据"""
@@ -100,23 +199,7 @@ class Reading_Steganography:
         magic_string = ''.join(chr(byte) for byte in read_magic)
 
         if magic == magic_string:
-            data_length = reader.read_int32()
-            gzip_data = reader.read_n_bytes(data_length // 8)  # 假设数据长度为比特数，因此除以 8
-
-            try:
-                # 使用 io.BytesIO 将字节数据包装成类似文件对象
-                with io.BytesIO(bytes(gzip_data)) as byte_stream:
-                    with gzip.GzipFile(fileobj=byte_stream) as f:
-                        decompressed_data = f.read()
-
-                # 解压后的数据解析为 JSON
-                json_string = decompressed_data.decode('utf-8')
-                return json.loads(json_string)
-
-            except OSError as e:
-                print(f"Gzip 解压缩错误: {e}")
-            except Exception as e:
-                print(f"解压或解析数据时出错: {e}")
+            return Reading_Steganography._read_payload(reader)
         else:
             print("魔术数字不匹配")
 
@@ -128,15 +211,19 @@ class Reading_Steganography:
         # 加载图片
         img = Reading_Steganography.load_image(image_path)
 
-        # 提取最低有效位
-        lowest_data = Reading_Steganography.extract_lsb(img)
+        # 按需读取最低有效位，魔术数字不匹配或数据结束后不再读取剩余像素
+        reader = Reading_Steganography.AlphaBitReader(img)
+        magic = Reading_Steganography.MAGIC_NUMBER
+        if reader.remaining_bytes() < len(magic) + 4:
+            return None
 
         # 获取魔术数字
-        magic_string = Reading_Steganography.get_magic_string(lowest_data, Reading_Steganography.MAGIC_NUMBER)
+        magic_string = reader.read_n_bytes(len(magic)).decode('latin-1')
+        print(f"读取到的魔术数字: {magic_string}")
 
         # 如果魔术数字匹配，则提取隐藏数据
-        if magic_string == Reading_Steganography.MAGIC_NUMBER:
-            json_data = Reading_Steganography.extract_stealth_data(lowest_data)
+        if magic_string == magic:
+            json_data = Reading_Steganography._read_payload(reader)
             if json_data:
                 #print(f"解析的 JSON data: {json_data}")
                 return json_data
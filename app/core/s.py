@@ -1,13 +1,18 @@
 import gzip
 import json
 import io
+import operator
 from PIL import Image
-from typing import Union
+from PIL.PngImagePlugin import PngInfo
+from typing import Iterator, Optional, Union
 
 
 class Steganography:
     MAGIC_NUMBER = "stealth_pngcomp"
 
+    # 将 alpha 值的最低有效位清零的查找表
+    CLEAR_LSB_TABLE = [value & ~1 for value in range(256)]
+
     class DataWriter:
         def __init__(self, data=None):
             """初始化时可以传入数据，若未传入则默认为空列表"""
@@ -57,24 +62,29 @@ class Steganography:
 
     @staticmethod
     def embed_lsb(img: Image.Image, lsb_data: list):
-        """将数据嵌入到图像的最低有效位（LSB）"""
-        pixels = img.load()
+        """
+        将数据嵌入到图像的最低有效位（LSB），按列优先顺序写入 alpha 通道。
+
+        整个 alpha 通道的最低位先通过查表清零（与原先用零填充剩余像素的结果一致），
+        再只对数据所在的若干列转置后批量写入，最后用 putalpha 替换 alpha 通道。
+        """
         width, height = img.size
         total_pixels = width * height
 
-        # 检查 lsb_data 是否足够填充图像的所有像素
-        if len(lsb_data) < total_pixels:
-            # 填充空字节（零）以确保数据长度与图像像素数匹配
-            additional_bits_needed = total_pixels - len(lsb_data)
-            lsb_data.extend([0] * additional_bits_needed)  # 用零填充到所需长度
-
-        count = 0
-        for x in range(width):  # 先按列遍历
-            for y in range(height):  # 再按行遍历
-                r, g, b, a = pixels[x, y]  # 提取 RGBA 值
-                new_a = (a & ~1) | lsb_data[count]  # 设置新的 alpha 通道最低有效位
-                pixels[x, y] = (r, g, b, new_a)  # 修改 alpha 通道
-                count += 1
+        # 数据超过像素数时无法完整写入
+        if len(lsb_data) > total_pixels:
+            raise ValueError(f"数据过大：需要 {len(lsb_data)} 个像素，图像只有 {total_pixels} 个像素")
+
+        alpha = img.getchannel("A").point(Steganography.CLEAR_LSB_TABLE)
+        columns = -(-len(lsb_data) // height)  # 数据占用的列数（向上取整）
+        if columns:
+            # 转置后每一行对应原图的一列，字节顺序即为列优先顺序
+            region = alpha.crop((0, 0, columns, height)).transpose(Image.Transpose.TRANSPOSE)
+            pixels = region.tobytes()
+            payload = bytes(map(operator.or_, pixels[:len(lsb_data)], lsb_data))
+            region = Image.frombytes("L", region.size, payload + pixels[len(lsb_data):])
+            alpha.paste(region.transpose(Image.Transpose.TRANSPOSE), (0, 0))
+        img.putalpha(alpha)
 
     @staticmethod
     def prepare_data(data: dict) -> list:
@@ -120,6 +130,43 @@ class Steganography:
         """保存修改后的图像"""
         img.save(output_path)
 
+    @staticmethod
+    def save_to_buffer(
+            img: Image.Image,
+            compress_level: int = 6,
+            text_data: Optional[dict] = None
+    ) -> io.BytesIO:
+        """
+        将图像编码为 PNG 写入内存缓冲区，不落盘。
+
+        参数:
+            compress_level (int): PNG 压缩级别 0~9，越小越快、文件越大。
+            text_data (dict): 若提供，每个顶层键同时写入一个文本块（与 NovelAI 原图结构一致），
+                              字符串原样写入，其它值编码为 JSON；关键字必须是 1~79 个 Latin-1 字符。
+        """
+        pnginfo = None
+        if text_data is not None:
+            pnginfo = PngInfo()
+            for key, value in text_data.items():
+                if not 1 <= len(key) <= 79 or not all(ord(char) < 256 for char in key):
+                    raise ValueError(f"文本块关键字必须是 1~79 个 Latin-1 字符: {key}")
+                # 非 Latin-1 的值由 Pillow 自动写为 iTXt 块
+                pnginfo.add_text(key, value if isinstance(value, str) else json.dumps(value, ensure_ascii=False))
+
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG", compress_level=compress_level, pnginfo=pnginfo)
+        buffer.seek(0)
+        return buffer
+
+    @staticmethod
+    def iter_buffer(buffer: io.BytesIO, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """按块读取缓冲区，用于流式响应"""
+        while True:
+            chunk = buffer.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
     @staticmethod
     def main(image_path: Union[str, io.BytesIO], data: dict, output_path: str):
         """主函数，执行数据嵌入和保存图像"""
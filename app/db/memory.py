@@ -0,0 +1,140 @@
+import copy
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from bson import ObjectId
+
+
+class InMemoryCursor:
+    """find() 返回的游标，支持 sort / limit / batch_size / to_list / async for"""
+
+    def __init__(self, documents: List[Dict[str, Any]], projection: Optional[Dict[str, int]]):
+        self._documents = documents
+        self._projection = projection
+
+    def sort(self, key: Union[str, List[Tuple[str, int]]], direction: int = 1) -> "InMemoryCursor":
+        keys = [(key, direction)] if isinstance(key, str) else key
+        for field, field_direction in reversed(keys):
+            self._documents.sort(key=lambda doc: _sort_value(doc.get(field)), reverse=field_direction < 0)
+        return self
+
+    def limit(self, limit: int) -> "InMemoryCursor":
+        # 与 MongoDB 一致，0 表示不限制
+        if limit:
+            self._documents = self._documents[:limit]
+        return self
+
+    def batch_size(self, size: int) -> "InMemoryCursor":
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        documents = self._documents if length is None else self._documents[:length]
+        return [_project(doc, self._projection) for doc in documents]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self._documents:
+            yield _project(document, self._projection)
+
+
+class InMemoryCollection:
+    """
+    进程内的 MongoDB 集合替身，只实现本项目用到的 motor 接口子集。
+
+    用于压测和本地运行，数据不持久化；查询条件支持等值、$in、$gt、$ne。
+    """
+
+    def __init__(self):
+        self._documents: List[Dict[str, Any]] = []
+
+    async def create_index(self, keys, **kwargs) -> str:
+        return str(keys)
+
+    async def find_one(self, filter: Optional[Dict[str, Any]] = None, projection=None, sort=None):
+        matched = [doc for doc in self._documents if _matches(doc, filter or {})]
+        if not matched:
+            return None
+        if sort:
+            # 只取第一条，用 min/max 代替整体排序（save_db 每次入库都会按序号取最大值）
+            field, direction = sort[0]
+            pick = max if direction < 0 else min
+            matched = [pick(matched, key=lambda doc: _sort_value(doc.get(field)))]
+        return _project(matched[0], projection)
+
+    def find(self, filter: Optional[Dict[str, Any]] = None, projection=None) -> InMemoryCursor:
+        matched = [doc for doc in self._documents if _matches(doc, filter or {})]
+        return InMemoryCursor(matched, projection)
+
+    async def insert_one(self, document: Dict[str, Any]):
+        document.setdefault("_id", ObjectId())
+        self._documents.append(copy.deepcopy(document))
+
+    async def insert_many(self, documents: List[Dict[str, Any]], ordered: bool = True):
+        for document in documents:
+            await self.insert_one(document)
+
+    async def update_one(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False):
+        for document in self._documents:
+            if _matches(document, filter):
+                _apply_update(document, update, inserting=False)
+                return
+        if upsert:
+            document = {key: value for key, value in filter.items() if not isinstance(value, dict)}
+            _apply_update(document, update, inserting=True)
+            await self.insert_one(document)
+
+    async def bulk_write(self, requests, ordered: bool = True):
+        # pymongo 的 UpdateOne 只暴露私有属性
+        for request in requests:
+            await self.update_one(request._filter, request._doc, upsert=request._upsert)
+
+    async def count_documents(self, filter: Dict[str, Any]) -> int:
+        return sum(1 for doc in self._documents if _matches(doc, filter))
+
+    async def delete_many(self, filter: Dict[str, Any]):
+        self._documents = [doc for doc in self._documents if not _matches(doc, filter)]
+
+
+def _sort_value(value: Any) -> Tuple[int, Any]:
+    # None 排在最前，与 MongoDB 一致
+    return (0, 0) if value is None else (1, value)
+
+
+def _matches(document: Dict[str, Any], filter: Dict[str, Any]) -> bool:
+    for field, condition in filter.items():
+        value = document.get(field)
+        if isinstance(condition, dict):
+            for operator, operand in condition.items():
+                if operator == "$in" and value not in operand:
+                    return False
+                if operator == "$gt" and (value is None or not value > operand):
+                    return False
+                if operator == "$ne" and value == operand:
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _project(document: Dict[str, Any], projection: Optional[Dict[str, int]]) -> Dict[str, Any]:
+    document = copy.deepcopy(document)
+    if not projection:
+        return document
+    included = [field for field, flag in projection.items() if flag and field != "_id"]
+    if included:
+        result = {field: document[field] for field in included if field in document}
+        if projection.get("_id", 1) and "_id" in document:
+            result["_id"] = document["_id"]
+        return result
+    return {field: value for field, value in document.items() if projection.get(field, 1)}
+
+
+def _apply_update(document: Dict[str, Any], update: Dict[str, Any], inserting: bool):
+    for field, value in update.get("$set", {}).items():
+        document[field] = value
+    for field, value in update.get("$inc", {}).items():
+        document[field] = document.get(field, 0) + value
+    if inserting:
+        for field, value in update.get("$setOnInsert", {}).items():
+            document[field] = value
@@ -0,0 +1,110 @@
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import DESCENDING, UpdateOne
+
+from app.db.db import collection, stats_collection
+
+# 统计的维度：维度名 -> 文档中的字段
+STAT_FIELDS = {
+    "采样器": "采样器",
+    "步数": "步数",
+    "缩放": "缩放",
+}
+SIZE_DIMENSION = "尺寸"  # 宽度×高度
+TOTAL_ID = "总数"
+DIMENSIONS = list(STAT_FIELDS) + [SIZE_DIMENSION]
+MAX_STATS_LIMIT = 1000  # 每个维度最多返回的项数
+
+
+def stat_keys(document: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    """文档对应的 (维度, 值) 列表"""
+    keys = [(dimension, document[field]) for dimension, field in STAT_FIELDS.items() if document.get(field) is not None]
+    if document.get("宽度") is not None and document.get("高度") is not None:
+        keys.append((SIZE_DIMENSION, f"{document['宽度']}×{document['高度']}"))
+    return keys
+
+
+def _stat_id(dimension: str, value: Any) -> str:
+    return f"{dimension}:{value}"
+
+
+async def increment_stats(documents: Iterable[Dict[str, Any]]):
+    """
+    新文档入库后更新统计计数（原子 $inc + upsert）。
+
+    每个 (维度, 值) 对应 stats 集合中的一个文档，同一批中的相同键先合并再写入。
+    """
+    counter = Counter()
+    total = 0
+    for document in documents:
+        total += 1
+        counter.update(stat_keys(document))
+    if not total:
+        return
+
+    requests = [UpdateOne({"_id": TOTAL_ID}, {"$inc": {"数量": total}}, upsert=True)]
+    requests.extend(
+        UpdateOne(
+            {"_id": _stat_id(dimension, value)},
+            {"$inc": {"数量": count}, "$setOnInsert": {"维度": dimension, "值": value}},
+            upsert=True,
+        )
+        for (dimension, value), count in counter.items()
+    )
+    await stats_collection.bulk_write(requests, ordered=False)
+
+
+async def get_stats(dimension: Optional[str] = None, limit: int = 50) -> Dict[str, Any]:
+    """读取统计结果，每个维度按数量降序返回前 limit 项"""
+    total = await stats_collection.find_one({"_id": TOTAL_ID})
+    result: Dict[str, Any] = {TOTAL_ID: total["数量"] if total else 0}
+
+    for name in ([dimension] if dimension else DIMENSIONS):
+        cursor = stats_collection.find({"维度": name}, {"_id": 0, "值": 1, "数量": 1})
+        cursor = cursor.sort("数量", DESCENDING).limit(limit)
+        result[name] = await cursor.to_list(length=limit)
+    return result
+
+
+async def rebuild_stats():
+    """
+    从 images 集合全量重建统计（用于回填历史数据）。
+
+    结果先写入临时集合，再通过 rename(dropTarget=True) 原子替换 stats 集合：
+    重建期间读到的仍是旧统计，重建失败时旧统计保持不变。
+    重建期间新入库的文档可能被重复或遗漏计数，应在没有写入时执行。
+    """
+    total = await collection.count_documents({})
+    # 按 _id 合并：与 increment_stats 一致，_stat_id 相同的值（如 5 和 "5"）计入同一项
+    documents = {TOTAL_ID: {"_id": TOTAL_ID, "数量": total}}
+
+    def add(dimension: str, value: Any, count: int):
+        stat_id = _stat_id(dimension, value)
+        if stat_id in documents:
+            documents[stat_id]["数量"] += count
+        else:
+            documents[stat_id] = {"_id": stat_id, "维度": dimension, "值": value, "数量": count}
+
+    for dimension, field in STAT_FIELDS.items():
+        pipeline = [
+            {"$match": {field: {"$ne": None}}},
+            {"$group": {"_id": f"${field}", "数量": {"$sum": 1}}},
+        ]
+        async for group in collection.aggregate(pipeline, allowDiskUse=True):
+            add(dimension, group["_id"], group["数量"])
+
+    pipeline = [
+        {"$match": {"宽度": {"$ne": None}, "高度": {"$ne": None}}},
+        {"$group": {"_id": {"宽度": "$宽度", "高度": "$高度"}, "数量": {"$sum": 1}}},
+    ]
+    async for group in collection.aggregate(pipeline, allowDiskUse=True):
+        add(SIZE_DIMENSION, f"{group['_id']['宽度']}×{group['_id']['高度']}", group["数量"])
+
+    # 清理上次失败留下的临时集合，写入并建好索引后再替换
+    temp_collection = stats_collection.database[f"{stats_collection.name}_rebuild"]
+    await temp_collection.drop()
+    await temp_collection.insert_many(list(documents.values()))
+    await temp_collection.create_index([("维度", 1), ("数量", -1)])
+    await temp_collection.rename(stats_collection.name, dropTarget=True)
+    return total
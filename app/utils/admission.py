@@ -0,0 +1,133 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from io import BytesIO
+from typing import Dict
+
+from fastapi import HTTPException
+from PIL import Image
+
+from app.core.container_scan import ContainerMetadataScanner
+
+# 准入控制配置（可通过环境变量覆盖）
+MAX_IMAGE_BYTES = int(os.environ.get("IMG_JX_MAX_IMAGE_BYTES", 50 * 1024 * 1024))  # 单张图片最大字节数
+MAX_IMAGE_PIXELS = int(os.environ.get("IMG_JX_MAX_IMAGE_PIXELS", 64 * 1024 * 1024))  # 单张图片最大像素数
+FETCH_SLOTS = int(os.environ.get("IMG_JX_FETCH_SLOTS", 16))  # 同时下载的图片数
+FETCH_QUEUE = int(os.environ.get("IMG_JX_FETCH_QUEUE", 64))  # 等待下载的最大请求数
+DECODE_SLOTS = int(os.environ.get("IMG_JX_DECODE_SLOTS", 4))  # 同时解码/提取的图片数
+DECODE_QUEUE = int(os.environ.get("IMG_JX_DECODE_QUEUE", 32))  # 等待解码的最大请求数
+QUEUE_TIMEOUT = float(os.environ.get("IMG_JX_QUEUE_TIMEOUT", 10))  # 排队超时时间（秒）
+RETRY_AFTER = int(os.environ.get("IMG_JX_RETRY_AFTER", 5))  # 过载时建议客户端重试的间隔（秒）
+
+# 让 Pillow 自身的解压炸弹检查与这里的限制保持一致
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+
+class AdmissionStage:
+    """
+    单个处理阶段的准入控制：固定数量的并发槽位 + 有界等待队列。
+
+    队列已满或排队超时时立即返回 503 和 Retry-After，而不是无限堆积请求。
+    """
+
+    def __init__(self, name: str, slots: int, max_waiting: int, timeout: float = QUEUE_TIMEOUT):
+        self.name = name
+        self.slots = slots
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(slots)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def _overloaded(self, reason: str) -> HTTPException:
+        self.rejected += 1
+        return HTTPException(
+            status_code=503,
+            detail=f"服务繁忙（{self.name}{reason}），请稍后重试",
+            headers={"Retry-After": str(RETRY_AFTER)},
+        )
+
+    @asynccontextmanager
+    async def acquire(self):
+        """占用一个槽位，结束后自动释放"""
+        if self.active >= self.slots and self.waiting >= self.max_waiting:
+            raise self._overloaded("队列已满")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise self._overloaded("排队超时")
+        finally:
+            self.waiting -= 1
+
+        self.active += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "槽位": self.slots,
+            "处理中": self.active,
+            "排队中": self.waiting,
+            "已准入": self.admitted,
+            "已拒绝": self.rejected,
+        }
+
+
+class AdmissionController:
+    """按阶段划分的准入控制器：fetch（下载）和 decode（解码、提取、入库）"""
+    fetch = AdmissionStage("下载", FETCH_SLOTS, FETCH_QUEUE)
+    decode = AdmissionStage("解码", DECODE_SLOTS, DECODE_QUEUE)
+
+    @staticmethod
+    def stats() -> Dict[str, Dict[str, int]]:
+        return {
+            "下载": AdmissionController.fetch.stats(),
+            "解码": AdmissionController.decode.stats(),
+        }
+
+    @staticmethod
+    def too_large(detail: str) -> HTTPException:
+        return HTTPException(status_code=413, detail=detail)
+
+    @staticmethod
+    def check_byte_size(size: int):
+        """检查图片字节数"""
+        if size > MAX_IMAGE_BYTES:
+            raise AdmissionController.too_large(f"图片过大: {size} 字节，上限 {MAX_IMAGE_BYTES} 字节")
+
+    @staticmethod
+    def check_image_limits(img_data: BytesIO):
+        """
+        在任何解码之前检查图片大小：字节数，以及从文件头读取的宽高对应的像素数。
+
+        JPEG/WebP 使用容器扫描器，其它格式使用 Pillow 的惰性打开（只解析文件头）。
+        """
+        AdmissionController.check_byte_size(img_data.getbuffer().nbytes)
+
+        scan_result = ContainerMetadataScanner.scan(img_data)
+        if scan_result is not None and scan_result["width"] and scan_result["height"]:
+            width, height = scan_result["width"], scan_result["height"]
+        else:
+            position = img_data.tell()
+            try:
+                with Image.open(img_data) as image:
+                    width, height = image.size
+            except Image.DecompressionBombError as e:
+                raise AdmissionController.too_large(f"图片像素过多: {e}")
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"无法识别的图片: {str(e)}")
+            finally:
+                img_data.seek(position)
+
+        if width * height > MAX_IMAGE_PIXELS:
+            raise AdmissionController.too_large(
+                f"图片像素过多: {width}x{height}，上限 {MAX_IMAGE_PIXELS} 像素"
+            )
@@ -0,0 +1,57 @@
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Hashable, Union
+from urllib.parse import urlsplit, urlunsplit
+
+
+class SingleFlight:
+    """
+    合并并发的相同请求：同一个 key 在执行中时，后到的调用直接等待第一个调用的结果。
+
+    工作协程以独立 Task 运行并通过 asyncio.shield 等待，
+    因此发起者断开连接（被取消）不会影响其它等待同一结果的请求。
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.executed = 0  # 实际执行的次数
+        self.coalesced = 0  # 被合并（直接复用结果）的次数
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """执行 func()，若相同 key 正在执行则复用其结果（包括异常）"""
+        task = self._in_flight.get(key)
+        if task is None:
+            self.executed += 1
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        """合并统计信息"""
+        return {
+            "执行次数": self.executed,
+            "合并次数": self.coalesced,
+            "进行中": len(self._in_flight),
+        }
+
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        """规范化 URL 作为合并键：协议和主机名小写、去掉默认端口和片段"""
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        netloc = parts.netloc.lower()
+        try:
+            port = parts.port
+        except ValueError:
+            port = None
+        if (scheme, port) in (("http", 80), ("https", 443)):
+            netloc = netloc.rsplit(":", 1)[0]
+        return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+    @staticmethod
+    def content_key(data: Union[bytes, memoryview]) -> str:
+        """上传内容的哈希，作为合并键"""
+        return hashlib.blake2b(data, digest_size=20).hexdigest()
@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import csv
+import os
+import time
+from typing import Optional, Tuple
+
+import orjson
+
+from app.api_server.export import EXPORT_FIELDS, build_query, export_stream, parse_export_fields
+
+
+def find_resume_point(output: str, export_format: str) -> Tuple[int, Optional[int]]:
+    """
+    查找已有导出文件中最后一条完整记录，用于断点续传。
+
+    上次导出可能在写入中途被中断，末尾残留半行；只有以换行结尾的记录才算完整。
+
+    返回:
+        (最后一条完整记录结束处的字节偏移, 该记录的序号；没有数据行时为 None)
+    """
+    if export_format == "csv":
+        return find_csv_resume_point(output)
+
+    with open(output, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        start = f.tell()
+        chunk_size = 64 * 1024
+        data = b""
+        # 从末尾向前读取，直到包含最后一个换行符以及它之前的一整行
+        while start > 0 and data.count(b"\n") < 2:
+            chunk_start = max(0, start - chunk_size)
+            f.seek(chunk_start)
+            data = f.read(start - chunk_start) + data
+            start = chunk_start
+
+    last_newline = data.rfind(b"\n")
+    if last_newline < 0:
+        return 0, None
+    last_line = data[:last_newline].rsplit(b"\n", 1)[-1]
+    try:
+        last_index = orjson.loads(last_line)["序号"]
+    except (orjson.JSONDecodeError, KeyError, TypeError) as e:
+        raise ValueError(f"无法从导出文件最后一条完整记录读取序号: {e}")
+    return start + last_newline + 1, last_index
+
+
+def find_csv_resume_point(output: str) -> Tuple[int, Optional[int]]:
+    """CSV 字段中可能包含换行，逐条解析并记录每条完整记录结束处的字节偏移（内存占用恒定）"""
+    consumed = 0
+    line_complete = True
+
+    def read_lines(f):
+        nonlocal consumed, line_complete
+        for line in f:
+            consumed += len(line)
+            line_complete = line.endswith(b"\n")
+            yield line.decode("utf-8")
+
+    length, last_index = 0, None
+    with open(output, "rb") as f:
+        # strict 模式下文件在引号内结束会抛出 csv.Error，而不是返回半条记录
+        reader = csv.reader(read_lines(f), strict=True)
+        try:
+            for row in reader:
+                # csv.reader 不会预读，此时 consumed 恰好是本条记录的结尾；没有换行说明是残留的半行
+                if not line_complete:
+                    break
+                length = consumed
+                # 表头第一列固定为“序号”
+                if row and row[0] != "序号":
+                    last_index = int(row[0])
+        except (csv.Error, UnicodeDecodeError):
+            pass
+    return length, last_index
+
+
+async def export(args):
+    fields = args.fields
+    after = args.after
+    mode = "wb"
+    skip_header = False
+    if args.resume and os.path.exists(args.output) and os.path.getsize(args.output) > 0:
+        # 截掉末尾不完整的记录后追加，已有的完整记录保持不变
+        length, last_index = find_resume_point(args.output, args.format)
+        with open(args.output, "r+b") as f:
+            f.truncate(length)
+        mode = "ab"
+        skip_header = args.format == "csv" and length > 0
+        if last_index is not None:
+            after = last_index
+            print(f"从序号 {last_index} 之后继续导出")
+
+    query = build_query(after, args.sampler, args.width, args.height)
+    stream = export_stream(args.format, query, fields)
+
+    start = time.perf_counter()
+    written = 0
+    with open(args.output, mode) as f:
+        first = True
+        async for chunk in stream:
+            # 续传 CSV 时跳过重复的表头
+            if first and skip_header:
+                first = False
+                continue
+            first = False
+            f.write(chunk)
+            written += len(chunk)
+
+    elapsed = time.perf_counter() - start
+    print(f"导出完成：{args.output}，写入 {written / (1024 ** 2):.2f} MB，耗时 {elapsed:.1f} 秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="流式导出 images 集合为 NDJSON 或 CSV")
+    parser.add_argument("output", help="输出文件路径")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson", help="导出格式")
+    parser.add_argument("--fields", default=None, help=f"逗号分隔的导出字段，可选：{','.join(EXPORT_FIELDS)}")
+    parser.add_argument("--after", type=int, default=None, help="从该序号之后开始导出")
+    parser.add_argument("--resume", action="store_true", help="截掉输出文件末尾不完整的记录，从最后一条完整记录的序号之后追加导出")
+    parser.add_argument("--sampler", default=None, help="按采样器过滤")
+    parser.add_argument("--width", type=int, default=None, help="按宽度过滤")
+    parser.add_argument("--height", type=int, default=None, help="按高度过滤")
+    args = parser.parse_args()
+    try:
+        args.fields = parse_export_fields(args.fields)
+    except ValueError as e:
+        parser.error(str(e))
+    asyncio.run(export(args))
+
+
+if __name__ == '__main__':
+    main()
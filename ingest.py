@@ -0,0 +1,162 @@
+import argparse
+import asyncio
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Iterator, List, Optional, Set, Tuple
+
+from app.api_server.img_jx import UPLOAD_FOLDER, build_tag_document, content_hash, extract_img_metadata, stored_file_name
+from app.db.db import collection
+from app.db.stats import increment_stats
+from app.utils.admission import AdmissionController
+
+# 默认处理的图片扩展名
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+
+def extract_tag_document(path: str) -> Tuple[str, Optional[dict], Optional[str]]:
+    """
+    在子进程中提取单张图片的入库字段，并记录内容哈希（与 save_db 相同）。
+
+    返回:
+        (路径, tag_document 或 None, 错误信息或 None)
+    """
+    try:
+        with open(path, "rb") as f:
+            img_data = BytesIO(f.read())
+        AdmissionController.check_image_limits(img_data)
+        tags = extract_img_metadata(img_data)
+        generation_info = tags.get("稳定扩散(stable_diffusion)或novelai元数据", {}).get("生成信息", {})
+        tag_document = build_tag_document(generation_info) or None
+        if tag_document is not None:
+            tag_document["内容哈希"] = content_hash(img_data)
+        return path, tag_document, None
+    except Exception as e:
+        return path, None, getattr(e, "detail", None) or str(e)
+
+
+def walk_images(root: str, extensions: Tuple[str, ...]) -> Iterator[str]:
+    """按稳定顺序遍历目录树中的图片文件"""
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            if file_name.lower().endswith(extensions):
+                yield os.path.join(dir_path, file_name)
+
+
+def load_checkpoint(checkpoint: str) -> Set[str]:
+    """读取已完成的文件列表（每行一个路径）"""
+    if not os.path.exists(checkpoint):
+        return set()
+    with open(checkpoint, "r", encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+async def find_existing_hashes(hashes: List[str]) -> Set[str]:
+    """查询已入库的内容哈希，用于跳过重复导入的文件"""
+    if not hashes:
+        return set()
+    cursor = collection.find({"内容哈希": {"$in": hashes}}, {"_id": 0, "内容哈希": 1})
+    return {document["内容哈希"] async for document in cursor}
+
+
+def batched(paths: Iterator[str], size: int) -> Iterator[List[str]]:
+    batch = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def ingest(root: str, workers: int, batch_size: int, checkpoint: str, extensions: Tuple[str, ...]):
+    """
+    并行导入目录中的图片：子进程池提取元数据，主进程分配序号、复制文件并批量写入 MongoDB。
+
+    每批写入成功后，只把已入库（或已存在）和没有生成信息的路径追加到检查点文件，
+    处理失败的文件下次运行时会重试。文档记录内容哈希，写入前跳过已入库的内容，
+    因此写入数据库后、写检查点前中断，重新运行也不会重复入库（该批的统计计数可能缺失，
+    可用 rebuild_stats.py 重建）。导入期间序号由本进程顺序分配，不要同时通过 API 入库。
+    """
+    done = load_checkpoint(checkpoint)
+    pending = (path for path in walk_images(os.path.abspath(root), extensions) if path not in done)
+    if done:
+        print(f"从检查点恢复，跳过 {len(done)} 个已完成文件")
+
+    last_image = await collection.find_one(sort=[("序号", -1)])
+    next_index = 1 if not last_image else last_image.get("序号", 0) + 1
+    if not os.path.exists(UPLOAD_FOLDER):
+        os.makedirs(UPLOAD_FOLDER)
+
+    loop = asyncio.get_running_loop()
+    processed = inserted = skipped = duplicated = failed = 0
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(checkpoint, "a", encoding="utf-8") as checkpoint_file:
+        for batch in batched(pending, batch_size):
+            results = await asyncio.gather(
+                *(loop.run_in_executor(pool, extract_tag_document, path) for path in batch)
+            )
+
+            existing = await find_existing_hashes(
+                [tag_document["内容哈希"] for _, tag_document, _ in results if tag_document]
+            )
+            documents = []
+            completed = []
+            for path, tag_document, error in results:
+                if error:
+                    failed += 1
+                    print(f"处理失败: {path}: {error}")
+                    continue
+                completed.append(path)
+                if tag_document is None:
+                    skipped += 1
+                elif tag_document["内容哈希"] in existing:
+                    duplicated += 1
+                else:
+                    existing.add(tag_document["内容哈希"])  # 同一批中的相同内容只入库一次
+                    file_name = stored_file_name(next_index)  # 与 save_db 相同，文件名按照序号生成
+                    shutil.copyfile(path, os.path.join(UPLOAD_FOLDER, file_name))
+                    tag_document["文件名"] = file_name
+                    tag_document["序号"] = next_index
+                    documents.append(tag_document)
+                    next_index += 1
+
+            if documents:
+                await collection.insert_many(documents, ordered=False)
+                await increment_stats(documents)
+            inserted += len(documents)
+            processed += len(batch)
+
+            checkpoint_file.write("".join(f"{path}\n" for path in completed))
+            checkpoint_file.flush()
+
+            elapsed = time.perf_counter() - start
+            print(f"已处理 {processed} 张（入库 {inserted}，已存在 {duplicated}，无生成信息 {skipped}，失败 {failed}），"
+                  f"{processed / elapsed:.1f} 张/秒")
+
+    elapsed = time.perf_counter() - start
+    rate = processed / elapsed if elapsed else 0.0
+    print(f"完成：共处理 {processed} 张，入库 {inserted} 张，耗时 {elapsed:.1f} 秒，平均 {rate:.1f} 张/秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量导入本地图片目录到 images 集合")
+    parser.add_argument("directory", help="图片目录（递归遍历）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="提取元数据的进程数")
+    parser.add_argument("--batch-size", type=int, default=256, help="每批写入数据库的图片数")
+    parser.add_argument("--checkpoint", default=None, help="检查点文件，默认为 <目录>/.ingest_checkpoint")
+    parser.add_argument("--extensions", default=",".join(IMAGE_EXTENSIONS), help="逗号分隔的扩展名")
+    args = parser.parse_args()
+
+    checkpoint = args.checkpoint or os.path.join(args.directory, ".ingest_checkpoint")
+    extensions = tuple(ext.strip().lower() for ext in args.extensions.split(",") if ext.strip())
+    asyncio.run(ingest(args.directory, args.workers, args.batch_size, checkpoint, extensions))
+
+
+if __name__ == '__main__':
+    main()
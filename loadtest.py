@@ -0,0 +1,276 @@
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+try:
+    import resource  # 仅 Linux / macOS 可用，用于读取峰值 RSS
+except ImportError:
+    resource = None
+
+# 合成图片的生成信息（模拟 NovelAI 的 Comment 字段）
+GENERATION_INFO = {
+    "prompt": "1girl, solo, best quality, amazing quality, very aesthetic, absurdres",
+    "steps": 28,
+    "scale": 5.5,
+    "sampler": "k_euler_ancestral",
+    "sm": False,
+    "sm_dyn": False,
+    "uc": "lowres, jpeg artifacts, worst quality, watermark, blurry",
+}
+CORPUS_KINDS = ("stealth_png", "text_png", "jpeg", "webp")
+
+
+def build_corpus(count: int, size: int) -> Dict[str, Tuple[bytes, str]]:
+    """生成合成图片语料：LSB 隐写 PNG、tEXt PNG、带 COM 段的 JPEG、WebP 轮流出现"""
+    from PIL import Image
+    from PIL.PngImagePlugin import PngInfo
+
+    from app.core.s import Steganography
+
+    corpus = {}
+    rng = random.Random(0)
+    for i in range(count):
+        kind = CORPUS_KINDS[i % len(CORPUS_KINDS)]
+        info = dict(GENERATION_INFO, seed=rng.randrange(2 ** 32), width=size, height=size)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        image = Image.new("RGBA", (size, size), color + (255,))
+        buffer = io.BytesIO()
+
+        if kind == "stealth_png":
+            data = {"Software": "NovelAI", "Comment": json.dumps(info)}
+            Steganography.embed_lsb(image, Steganography.prepare_data(data))
+            image.save(buffer, format="PNG")
+            name, content_type = f"{i}.png", "image/png"
+        elif kind == "text_png":
+            pnginfo = PngInfo()
+            pnginfo.add_text("Software", "NovelAI")
+            pnginfo.add_text("Comment", json.dumps(info))
+            image.save(buffer, format="PNG", pnginfo=pnginfo)
+            name, content_type = f"{i}.png", "image/png"
+        elif kind == "jpeg":
+            image.convert("RGB").save(buffer, format="JPEG", quality=90, comment=json.dumps(info).encode("utf-8"))
+            name, content_type = f"{i}.jpg", "image/jpeg"
+        else:
+            image.save(buffer, format="WEBP", quality=90)
+            name, content_type = f"{i}.webp", "image/webp"
+
+        corpus[name] = (buffer.getvalue(), content_type)
+    return corpus
+
+
+def start_corpus_server(corpus: Dict[str, Tuple[bytes, str]]) -> Tuple[ThreadingHTTPServer, str]:
+    """在后台线程中启动本地 HTTP 服务，供 fetch_image_from_url 下载语料"""
+
+    class CorpusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            name = self.path.split("?", 1)[0].rsplit("/", 1)[-1]
+            if name not in corpus:
+                self.send_error(404)
+                return
+            body, content_type = corpus[name]
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CorpusHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/img"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_app_server(port: int, data_folder: str, real_db: bool):
+    """子进程入口：替换数据库为内存替身后，从 create_app 启动服务"""
+    # 必须在导入其它 app 模块之前设置，UPLOAD_FOLDER 等在导入时读取
+    os.environ["IMG_JX_UPLOAD_FOLDER"] = data_folder
+
+    if not real_db:
+        import app.db.db as db
+        from app.db.memory import InMemoryCollection
+        db.collection = InMemoryCollection()
+        db.job_collection = InMemoryCollection()
+        db.stats_collection = InMemoryCollection()
+
+    import uvicorn
+
+    from app import create_app
+    uvicorn.run(create_app(), host="127.0.0.1", port=port, log_level="warning")
+
+
+async def wait_ready(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/api/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("服务启动超时")
+
+
+def parse_mix(mix: str) -> List[Tuple[str, float]]:
+    """解析 "img_jx=0.8,img_jx_and_db=0.2" 形式的请求比例"""
+    weights = []
+    for item in mix.split(","):
+        endpoint, _, weight = item.partition("=")
+        if endpoint.strip() not in ("img_jx", "img_jx_and_db"):
+            raise ValueError(f"不支持的接口: {endpoint}")
+        weights.append((endpoint.strip(), float(weight or 1)))
+    return weights
+
+
+async def drive(base_url: str, corpus_url: str, corpus: Dict[str, Tuple[bytes, str]], args) -> Tuple[list, float, dict]:
+    """按并发数持续发送请求，返回 (结果列表, 耗时, 服务端指标)；结果为 (接口, 状态码, 延迟秒)"""
+    mix = parse_mix(args.mix)
+    endpoints, weights = [m[0] for m in mix], [m[1] for m in mix]
+    names = list(corpus)
+    rng = random.Random(1)
+    results = []
+
+    async def send(client: httpx.AsyncClient, sequence: int, record: bool):
+        endpoint = rng.choices(endpoints, weights)[0]
+        name = rng.choice(names)
+        method = "GET" if endpoint == "img_jx" else "POST"
+        if rng.random() < args.upload_ratio:
+            body, content_type = corpus[name]
+            request = client.request(method, f"/api/{endpoint}", files={"file": (name, body, content_type)})
+        else:
+            url = f"{corpus_url}/{name}"
+            if args.unique_urls:
+                url += f"?n={sequence}"
+            request = client.request(method, f"/api/{endpoint}", params={"url": url})
+
+        start = time.perf_counter()
+        try:
+            status = (await request).status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        if record:
+            results.append((endpoint, status, time.perf_counter() - start))
+
+    async def run_phase(client: httpx.AsyncClient, first: int, count: int, record: bool):
+        # 各 worker 共享序号计数，总共发送 count 个请求
+        sequences = iter(range(first, first + count))
+
+        async def worker():
+            for sequence in sequences:
+                await send(client, sequence, record)
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        await run_phase(client, 0, args.warmup, record=False)
+        start = time.perf_counter()
+        await run_phase(client, args.warmup, args.requests, record=True)
+        elapsed = time.perf_counter() - start
+        metrics = (await client.get("/api/metrics")).json()
+    return results, elapsed, metrics
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_mb(who: int) -> Optional[float]:
+    """进程峰值 RSS（MB）；Linux 的 ru_maxrss 单位为 KB，macOS 为字节"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 ** 2) if sys.platform == "darwin" else rss / 1024
+
+
+def report(results: list, elapsed: float, metrics: dict, server_rss: Optional[float], client_rss: Optional[float]):
+    print(f"\n总请求数: {len(results)}，耗时 {elapsed:.2f} 秒，吞吐量 {len(results) / elapsed:.1f} 请求/秒")
+
+    for endpoint in sorted({r[0] for r in results}):
+        rows = [r for r in results if r[0] == endpoint]
+        latencies = [r[2] * 1000 for r in rows]
+        errors = [r for r in rows if r[1] != 200]
+        statuses: Dict[str, int] = {}
+        for row in rows:
+            statuses[str(row[1])] = statuses.get(str(row[1]), 0) + 1
+        print(f"\n[{endpoint}] 请求 {len(rows)}，错误率 {len(errors) / len(rows):.2%}，状态码 {statuses}")
+        print(f"  延迟(ms) p50={percentile(latencies, 0.5):.1f} p90={percentile(latencies, 0.9):.1f} "
+              f"p99={percentile(latencies, 0.99):.1f} max={max(latencies):.1f}")
+
+    print(f"\n服务端指标: {json.dumps(metrics, ensure_ascii=False)}")
+    print(f"服务端峰值 RSS: {f'{server_rss:.1f} MB' if server_rss is not None else '不可用'}")
+    print(f"压测端峰值 RSS: {f'{client_rss:.1f} MB' if client_rss is not None else '不可用'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端压测：本地语料服务 + 内存数据库替身 + create_app")
+    parser.add_argument("--requests", type=int, default=500, help="计入统计的请求数")
+    parser.add_argument("--warmup", type=int, default=20, help="预热请求数（不计入统计）")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发连接数")
+    parser.add_argument("--mix", default="img_jx=0.8,img_jx_and_db=0.2", help="接口比例")
+    parser.add_argument("--upload-ratio", type=float, default=0.5, help="使用文件上传（而非 URL）的请求比例")
+    parser.add_argument("--unique-urls", action="store_true", help="每个 URL 请求附加唯一参数，避免请求合并")
+    parser.add_argument("--corpus", type=int, default=40, help="合成图片数量")
+    parser.add_argument("--image-size", type=int, default=512, help="合成图片边长")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单个请求超时（秒）")
+    parser.add_argument("--real-db", action="store_true", help="使用 app/db/db.py 中配置的真实 MongoDB")
+    args = parser.parse_args()
+
+    print(f"生成 {args.corpus} 张 {args.image_size}x{args.image_size} 合成图片...")
+    corpus = build_corpus(args.corpus, args.image_size)
+    corpus_server, corpus_url = start_corpus_server(corpus)
+
+    port = free_port()
+    data_folder = tempfile.mkdtemp(prefix="img_jx_loadtest_")
+    server = multiprocessing.get_context("spawn").Process(
+        target=run_app_server, args=(port, data_folder, args.real_db)
+    )
+    server.start()
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        asyncio.run(wait_ready(base_url))
+        print(f"服务已启动: {base_url}，并发 {args.concurrency}，请求 {args.requests}（预热 {args.warmup}）")
+        results, elapsed, metrics = asyncio.run(drive(base_url, corpus_url, corpus, args))
+    finally:
+        # SIGTERM 触发 uvicorn 正常退出，join 之后才能读取子进程的峰值 RSS
+        server.terminate()
+        server.join()
+        corpus_server.shutdown()
+        shutil.rmtree(data_folder, ignore_errors=True)
+
+    report(
+        results,
+        elapsed,
+        metrics,
+        peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None,
+        peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+    )
+
+
+if __name__ == '__main__':
+    main()
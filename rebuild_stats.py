@@ -0,0 +1,18 @@
+import asyncio
+import time
+
+from app.db.stats import rebuild_stats
+
+
+async def rebuild():
+    start = time.perf_counter()
+    total = await rebuild_stats()
+    print(f"统计重建完成：共 {total} 条文档，耗时 {time.perf_counter() - start:.1f} 秒")
+
+
+def main():
+    asyncio.run(rebuild())
+
+
+if __name__ == '__main__':
+    main()
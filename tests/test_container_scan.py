@@ -0,0 +1,101 @@
+import json
+from io import BytesIO
+
+import piexif
+from PIL import Image
+
+from app.core.container_scan import ContainerMetadataScanner
+from app.core.ripd import ImageMetadataExtractor
+
+GENERATION_INFO = {"prompt": "1girl, solo", "steps": 28, "seed": 123}
+XMP_PACKET = (
+    '<x:xmpmeta xmlns:x="adobe:ns:meta/">'
+    '<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">'
+    '<rdf:Description xmlns:dc="http://purl.org/dc/elements/1.1/">'
+    '<dc:description><rdf:Alt><rdf:li xml:lang="x-default">xmp parameters</rdf:li></rdf:Alt></dc:description>'
+    '</rdf:Description></rdf:RDF></x:xmpmeta>'
+)
+
+
+def user_comment_exif(text: str) -> bytes:
+    """UNICODE 字符集（UTF-16LE）的 UserComment"""
+    user_comment = b"UNICODE\x00" + text.encode("utf-16-le")
+    return piexif.dump({"Exif": {piexif.ExifIFD.UserComment: user_comment}})
+
+
+def jpeg_bytes(size=(32, 16), **save_options) -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", size, (10, 20, 30)).save(buffer, format="JPEG", **save_options)
+    return buffer.getvalue()
+
+
+def webp_bytes(mode: str, **save_options) -> bytes:
+    color = (10, 20, 30, 128) if mode == "RGBA" else (10, 20, 30)
+    buffer = BytesIO()
+    Image.new(mode, (24, 12), color).save(buffer, format="WEBP", **save_options)
+    return buffer.getvalue()
+
+
+def test_detect_format():
+    assert ContainerMetadataScanner.detect_format(jpeg_bytes()[:12]) == "JPEG"
+    assert ContainerMetadataScanner.detect_format(webp_bytes("RGB")[:12]) == "WEBP"
+    assert ContainerMetadataScanner.detect_format(b"\x89PNG\r\n\x1a\n\x00\x00\x00\x0d") is None
+
+
+def test_jpeg_user_comment_com_and_xmp():
+    data = jpeg_bytes(
+        exif=user_comment_exif(json.dumps(GENERATION_INFO)),
+        comment=b"webui parameters",
+        xmp=XMP_PACKET.encode("utf-8"),
+    )
+    stream = BytesIO(data)
+    stream.seek(5)
+    result = ContainerMetadataScanner.scan(stream)
+
+    assert stream.tell() == 5  # 扫描后恢复原读取位置
+    assert (result["format"], result["width"], result["height"]) == ("JPEG", 32, 16)
+    assert result["alpha"] is False
+    assert result["comments"] == ["webui parameters"]
+    assert ContainerMetadataScanner.extract_xmp_texts(result["xmp"]) == ["xmp parameters"]
+
+    # UserComment 中的 JSON 对象优先作为 Comment，其余文本按 XMP、COM 顺序取第一个作为 parameters
+    metadata = ImageMetadataExtractor.get_all_metadata(BytesIO(data))
+    assert metadata["stable_diffusion_metadata"]["Comment"] == GENERATION_INFO
+    assert metadata["stable_diffusion_metadata"]["parameters"] == "xmp parameters"
+    assert metadata["file_info"]["format"] == "JPEG"
+
+
+def test_decode_user_comment_charsets():
+    text = "提示词 prompt"
+    decode = ContainerMetadataScanner.decode_user_comment
+    assert decode(b"UNICODE\x00" + text.encode("utf-16-le")) == text
+    # 没有 BOM 时按首个字符的零字节判断字节序，只对 ASCII 开头的文本可靠
+    assert decode(b"UNICODE\x00" + "prompt 提示词".encode("utf-16-be")) == "prompt 提示词"
+    assert decode(b"UNICODE\x00" + text.encode("utf-16")) == text
+    assert decode(b"ASCII\x00\x00\x00" + b"plain\x00") == "plain"
+    assert decode(b"short") is None
+
+
+def test_truncated_jpeg_returns_none():
+    data = jpeg_bytes(exif=user_comment_exif("x" * 200))
+    assert ContainerMetadataScanner.scan(BytesIO(data[:60])) is None
+
+
+def test_webp_exif():
+    data = webp_bytes("RGB", quality=80, exif=user_comment_exif(json.dumps(GENERATION_INFO)))
+    result = ContainerMetadataScanner.scan(BytesIO(data))
+
+    assert (result["format"], result["width"], result["height"]) == ("WEBP", 24, 12)
+    assert result["exif"] is not None
+    metadata = ImageMetadataExtractor.get_all_metadata(BytesIO(data))
+    assert metadata["stable_diffusion_metadata"]["Comment"] == GENERATION_INFO
+
+
+def test_webp_alpha_flag():
+    scan = ContainerMetadataScanner.scan
+    # 有损 / 无损、带 / 不带 alpha（带 EXIF 时使用 VP8X 扩展头）
+    assert scan(BytesIO(webp_bytes("RGB", quality=80)))["alpha"] is False
+    assert scan(BytesIO(webp_bytes("RGB", lossless=True)))["alpha"] is False
+    assert scan(BytesIO(webp_bytes("RGBA", quality=80)))["alpha"] is True
+    assert scan(BytesIO(webp_bytes("RGBA", lossless=True)))["alpha"] is True
+    assert scan(BytesIO(webp_bytes("RGBA", lossless=True, exif=user_comment_exif("x"))))["alpha"] is True
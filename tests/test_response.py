@@ -0,0 +1,22 @@
+import json
+
+import bson
+
+from app.api_server.jobs import to_document_value
+from app.api_server.response import FastJSONResponse
+
+
+def test_dumps_bytes_and_int_keys():
+    content = {"exif": {271: b"Canon", 37500: b"\xff\xfe\x00"}}
+    assert json.loads(FastJSONResponse.dumps(content)) == {"exif": {"271": "Canon", "37500": "//4A"}}
+
+
+def test_dumps_integers_beyond_64_bits():
+    content = {"生成信息": {"种子": 2 ** 70, "文本": "提示词", "原始": b"raw"}}
+    assert json.loads(FastJSONResponse.dumps(content)) == {"生成信息": {"种子": 2 ** 70, "文本": "提示词", "原始": "raw"}}
+
+
+def test_document_value_is_bson_encodable():
+    value = to_document_value({"种子": 2 ** 70, "无符号": 2 ** 63, "步数": 28, "SM": True, 1: b"x"})
+    assert value == {"种子": str(2 ** 70), "无符号": str(2 ** 63), "步数": 28, "SM": True, "1": "x"}
+    bson.encode(value)
@@ -0,0 +1,101 @@
+import gzip
+import json
+import time
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from app.core.rs import Reading_Steganography
+from app.core.s import Steganography
+
+
+def stealth_image(compressed: bytes, size=(64, 64), declared_length=None) -> BytesIO:
+    """将魔术数字、声明长度（比特数）和 gzip 数据写入 alpha 通道，返回 PNG"""
+    writer = Steganography.DataWriter()
+    writer.write_n_bytes(Steganography.MAGIC_NUMBER.encode("utf-8"))
+    writer.write_int32(len(compressed) * 8 if declared_length is None else declared_length)
+    writer.write_n_bytes(compressed)
+
+    img = Image.new("RGBA", size, (10, 20, 30, 255))
+    Steganography.embed_lsb(img, writer.data)
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    buffer.seek(0)
+    return buffer
+
+
+def json_payload(value) -> bytes:
+    return gzip.compress(json.dumps(value).encode("utf-8"))
+
+
+def test_reads_valid_payload():
+    data = {"Software": "NovelAI", "Comment": json.dumps({"prompt": "提示词"})}
+    assert Reading_Steganography.main(stealth_image(json_payload(data))) == data
+
+
+def test_no_magic_returns_none():
+    buffer = BytesIO()
+    Image.new("RGBA", (64, 64), (0, 0, 0, 255)).save(buffer, format="PNG")
+    assert Reading_Steganography.main(buffer) is None
+
+
+def test_image_too_small_for_header_returns_none():
+    buffer = BytesIO()
+    Image.new("RGBA", (4, 4)).save(buffer, format="PNG")
+    assert Reading_Steganography.main(buffer) is None
+
+
+@pytest.mark.parametrize("declared_length", [
+    0xFFFFFFFF,  # 声明约 512 MB，超过压缩数据上限
+    64 * 64,  # 未超过上限，但超出图像能容纳的位数
+])
+def test_oversized_declared_length_returns_none(declared_length):
+    image = stealth_image(json_payload({"a": 1}), declared_length=declared_length)
+    start = time.perf_counter()
+    assert Reading_Steganography.main(image) is None
+    assert time.perf_counter() - start < 1
+
+
+def test_gzip_bomb_returns_none():
+    bomb = gzip.compress(b"0" * (Reading_Steganography.MAX_DECOMPRESSED_BYTES * 4))
+    assert len(bomb) < Reading_Steganography.MAX_COMPRESSED_BYTES
+    assert Reading_Steganography.main(stealth_image(bomb, size=(512, 512))) is None
+
+
+def test_truncated_stream_returns_none():
+    compressed = json_payload({"prompt": "x" * 2000, "seed": list(range(200))})
+    assert Reading_Steganography.main(stealth_image(compressed[:len(compressed) // 2])) is None
+
+
+@pytest.mark.parametrize("value", [[1, 2], "text", 5, None])
+def test_non_object_payload_returns_none(value):
+    assert Reading_Steganography.main(stealth_image(json_payload(value))) is None
+
+
+def test_invalid_gzip_returns_none():
+    assert Reading_Steganography.main(stealth_image(b"not gzip data at all")) is None
+
+
+def test_inflate_bounded_limits():
+    compressed = gzip.compress(b"a" * 1000)
+    reader = BytesIO(compressed).read
+    assert Reading_Steganography.inflate_bounded(reader, len(compressed)) == b"a" * 1000
+
+    with pytest.raises(ValueError):
+        Reading_Steganography.inflate_bounded(BytesIO().read, Reading_Steganography.MAX_COMPRESSED_BYTES + 1)
+    with pytest.raises(ValueError):
+        Reading_Steganography.inflate_bounded(BytesIO(compressed[:10]).read, 10)
+
+
+def test_alpha_bit_reader_column_major():
+    img = Image.new("RGBA", (3, 5), (0, 0, 0, 0))
+    # 第 1 列全部为 1，其余为 0：列优先读取的前 5 位为 1
+    for y in range(5):
+        img.putpixel((0, y), (0, 0, 0, 1))
+    reader = Reading_Steganography.AlphaBitReader(img)
+
+    assert reader.remaining_bytes() == 1
+    assert reader.read_n_bytes(1) == bytes([0b11111000])
+    with pytest.raises(ValueError):
+        reader.read_n_bytes(1)
@@ -0,0 +1,62 @@
+import json
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from app.api_server.img_jx import build_tag_document, extract_img_metadata
+from app.core.s import Steganography
+
+GENERATION_INFO = {"prompt": "1girl, 提示词", "steps": 28, "scale": 5.5, "sampler": "k_euler", "width": 64, "height": 64}
+NOVELAI_METADATA = {"Software": "NovelAI", "Comment": json.dumps(GENERATION_INFO)}
+
+
+def png_bytes(size=(64, 64)) -> BytesIO:
+    buffer = BytesIO()
+    Image.new("RGB", size, (10, 20, 30)).save(buffer, format="PNG")
+    buffer.seek(0)
+    return buffer
+
+
+def embed(data: dict, text_chunk: bool) -> BytesIO:
+    img = Steganography.embed_data_into_image(png_bytes(), data)
+    return Steganography.save_to_buffer(img, compress_level=1, text_data=data if text_chunk else None)
+
+
+def generation_info(metadata: dict) -> dict:
+    return metadata["稳定扩散(stable_diffusion)或novelai元数据"]["生成信息"]
+
+
+@pytest.mark.parametrize("text_chunk", [False, True])
+def test_embed_round_trip(text_chunk):
+    metadata = extract_img_metadata(embed(NOVELAI_METADATA, text_chunk))
+
+    info = generation_info(metadata)
+    assert info["提示词"] == GENERATION_INFO["prompt"]
+    assert build_tag_document(info)["步数"] == 28
+
+
+def test_text_chunks_per_key():
+    data = {"Software": "NovelAI", "Comment": json.dumps(GENERATION_INFO), "Extra": {"a": 1}}
+    with Image.open(embed(data, text_chunk=True)) as image:
+        assert image.text == {"Software": "NovelAI", "Comment": data["Comment"], "Extra": '{"a": 1}'}
+
+
+def test_text_chunk_rejects_invalid_keyword():
+    with pytest.raises(ValueError):
+        embed({"软件": "NovelAI"}, text_chunk=True)
+
+
+def test_embed_matches_column_major_lsb():
+    img = Image.new("RGBA", (5, 7), (1, 2, 3, 255))
+    bits = [1, 0, 1, 1, 0, 0, 1, 0, 1, 1]
+    Steganography.embed_lsb(img, list(bits))
+
+    alpha = img.getchannel("A")
+    column_major = [alpha.getpixel((x, y)) & 1 for x in range(5) for y in range(7)]
+    assert column_major == bits + [0] * (35 - len(bits))
+
+
+def test_embed_rejects_oversized_payload():
+    with pytest.raises(ValueError):
+        Steganography.embed_lsb(Image.new("RGBA", (4, 4)), [1] * 17)